@@ -6,6 +6,7 @@ provide feedback. Designed for deployment on services like Vercel.
 from __future__ import annotations
 
 import json
+import logging
 import random
 import re
 from pathlib import Path
@@ -22,6 +23,8 @@ from main import StudentProfile, call_llm
 DATA_DIR = Path(__file__).parent / "data"
 QUESTIONS_FILE = DATA_DIR / "questions.json"
 
+log = logging.getLogger(__name__)
+
 with QUESTIONS_FILE.open("r", encoding="utf-8") as fh:
     _raw_questions = json.load(fh)
 
@@ -136,7 +139,7 @@ def select_question(profile: StudentProfile) -> dict:
     available_questions = QUESTIONS[level]
     
     # If we have topic preferences, try to match them
-    if hasattr(profile, 'preferred_topics') and profile.preferred_topics:
+    if profile.preferred_topics:
         topic_questions = [q for q in available_questions if q.get('topic') in profile.preferred_topics]
         if topic_questions:
             available_questions = topic_questions
@@ -173,7 +176,7 @@ def submit_answer(payload: AnswerPayload):
         raise HTTPException(status_code=404, detail="Unknown question")
     
     correct = is_mathematically_equivalent(payload.answer, q["answer"])
-    print(f"DEBUG: Comparing '{payload.answer}' with '{q['answer']}' -> {correct}")
+    log.debug("Comparing %r with %r -> %s", payload.answer, q["answer"], correct)
     
     # Record comprehensive session data
     profile.record_session(
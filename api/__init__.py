@@ -5,18 +5,41 @@ provide feedback. Designed for deployment on services like Vercel.
 """
 from __future__ import annotations
 
-import json
+import asyncio
+import hashlib
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
 import random
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
 from pathlib import Path
 from fractions import Fraction
-from decimal import Decimal, InvalidOperation
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
+import orjson
 from pydantic import BaseModel
 
-from main import StudentProfile, call_llm
+import main
+from main import StudentProfile, call_llm_async
+
+log = logging.getLogger(__name__)
 
 # locate project root (one directory above this file)
 ROOT_DIR = Path(__file__).resolve().parent.parent
@@ -24,17 +47,214 @@ DATA_DIR = ROOT_DIR / "data"
 QUESTIONS_FILE = DATA_DIR / "questions.json"
 STATIC_DIR = ROOT_DIR / "static"
 
-with QUESTIONS_FILE.open("r", encoding="utf-8") as fh:
-    _raw_questions = json.load(fh)
+# mtime of QUESTIONS_FILE as last loaded or saved by this process
+_questions_mtime = QUESTIONS_FILE.stat().st_mtime_ns
+_raw_questions = orjson.loads(QUESTIONS_FILE.read_bytes())
+
+def normalize_answer(answer: str) -> str:
+    """Normalize answer for comparison by removing extra spaces and converting to lowercase."""
+    return answer.strip().lower()
+
+
+def _has_numeric_char(text: str) -> bool:
+    """Whether any digit or fraction/decimal/sign character routes ``text`` to numeric matching.
+
+    ``str.isdigit`` rather than a regex digit class: it also counts
+    superscripts, so answers like "a² + b² = c²" keep the strict numeric
+    comparison.
+    """
+    return any(char.isdigit() or char in "./-" for char in text)
+
+# Keys added to question dicts at load time; stripped again before saving
+_DERIVED_QUESTION_KEYS = ("difficulty", "answer_norm", "answer_numeric")
 
-QUESTIONS = {level: qs for level, qs in _raw_questions.items()}
-QUESTION_INDEX = {
-    q["id"]: {**q, "difficulty": level}
-    for level, qs in QUESTIONS.items()
-    for q in qs
-}
 
-app = FastAPI(title="ThinkBot API")
+def _annotate_question(q: dict, level: str) -> dict:
+    """Tag ``q`` in place with its level and pre-normalized answer and return it.
+
+    ``QUESTION_INDEX`` and ``select_question`` share these dicts instead of
+    copying them per lookup.
+    """
+    # Levels and topics come from a small vocabulary; share one string each
+    q["difficulty"] = sys.intern(level)
+    if isinstance(q.get("topic"), str):
+        q["topic"] = sys.intern(q["topic"])
+    q["answer_norm"] = answer_norm = sys.intern(normalize_answer(str(q["answer"])))
+    q["answer_numeric"] = _has_numeric_char(answer_norm)
+    return q
+
+
+# Serializes writers of QUESTIONS_FILE (async endpoint and threadpool callers);
+# _questions_lock adds an flock on a sidecar file so worker processes queue too
+_questions_file_lock = threading.Lock()
+QUESTIONS_LOCK_FILE = QUESTIONS_FILE.with_name(QUESTIONS_FILE.name + ".lock")
+
+
+@contextmanager
+def _questions_lock():
+    """Hold the question-file lock across threads and, where fcntl exists, processes."""
+    with _questions_file_lock:
+        if fcntl is None:
+            yield
+            return
+        with QUESTIONS_LOCK_FILE.open("a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _save_questions() -> None:
+    """Write the current question bank to ``QUESTIONS_FILE``."""
+    with _questions_lock():
+        _write_questions()
+
+
+def _write_questions() -> None:
+    """Atomically replace ``QUESTIONS_FILE``; callers hold ``_questions_lock``."""
+    global _questions_mtime
+    body = orjson.dumps(_questions_for_disk(), option=orjson.OPT_INDENT_2)
+    # Readers (and other workers) see either the old or the new bank, never
+    # a half-written file
+    tmp = QUESTIONS_FILE.with_name(QUESTIONS_FILE.name + ".tmp")
+    tmp.write_bytes(body)
+    os.replace(tmp, QUESTIONS_FILE)
+    # What's on disk now matches memory, so load_questions can skip it
+    _questions_mtime = QUESTIONS_FILE.stat().st_mtime_ns
+
+
+def _add_questions(level: str, new_questions: list) -> list:
+    """Give ``new_questions`` ids, append them to ``level`` and save the bank.
+
+    The file is re-read under the lock first, so a batch another worker saved
+    in the meantime is kept rather than overwritten and ids stay unique.
+    Returns copies as stored on disk, without the internal derived keys.
+    """
+    with _questions_lock():
+        load_questions()
+        for q in new_questions:
+            q["id"] = next(_question_ids)
+        QUESTIONS[level] = QUESTIONS.get(level, ()) + tuple(new_questions)
+        _rebuild_indexes()
+        _write_questions()
+    return [_stored_question(q) for q in new_questions]
+
+
+def _stored_question(q: dict) -> dict:
+    """Return a copy of ``q`` without the keys ``_annotate_question`` derives."""
+    return {k: v for k, v in q.items() if k not in _DERIVED_QUESTION_KEYS}
+
+
+def _questions_for_disk() -> dict:
+    """Return ``QUESTIONS`` without the derived keys, for writing to disk."""
+    return {
+        level: [_stored_question(q) for q in qs]
+        for level, qs in QUESTIONS.items()
+    }
+
+
+def _build_topic_index(questions: dict) -> dict:
+    """Group questions as ``{level: {topic: (question, ...)}}`` for O(1) lookups."""
+    by_topic = {}
+    for level, qs in questions.items():
+        level_topics = by_topic.setdefault(level, {})
+        for q in qs:
+            level_topics.setdefault(q.get("topic", "general"), []).append(q)
+    # Buckets are read-only between rebuilds, like the level tuples
+    return {
+        level: {topic: tuple(qs) for topic, qs in level_topics.items()}
+        for level, level_topics in by_topic.items()
+    }
+
+
+def _rebuild_indexes() -> None:
+    """Rebuild ``QUESTION_INDEX`` and ``QUESTIONS_BY_TOPIC`` from ``QUESTIONS``.
+
+    Called at import, after reloading and after generating questions; the new
+    dicts replace the old ones wholesale so readers never see a partial index.
+    """
+    global QUESTION_INDEX, QUESTIONS_BY_TOPIC, _QUESTION_VIEWS
+    QUESTION_INDEX = {
+        q["id"]: _annotate_question(q, level)
+        for level, qs in QUESTIONS.items()
+        for q in qs
+    }
+    QUESTIONS_BY_TOPIC = _build_topic_index(QUESTIONS)
+    _QUESTION_VIEWS = {qid: _question_view(q) for qid, q in QUESTION_INDEX.items()}
+
+
+def _question_view(q: dict) -> dict:
+    """The ``/question`` response body for ``q``; shared, so never mutated."""
+    return {
+        "id": q["id"],
+        "question": q["question"],
+        "difficulty": q["difficulty"],
+        "topic": q.get("topic", "general"),
+        "answer": q["answer"],
+        "explanation": q.get("explanation", ""),
+    }
+
+
+# Levels hold immutable tuples; generation replaces them with extended tuples
+QUESTIONS = {level: tuple(qs) for level, qs in _raw_questions.items()}
+QUESTION_INDEX: dict = {}
+QUESTIONS_BY_TOPIC: dict = {}
+_QUESTION_VIEWS: dict = {}
+_rebuild_indexes()
+
+# Source of ids for generated questions; next() on a count is atomic, so the
+# async endpoint and threadpool generation can share it.
+_question_ids = itertools.count(max(QUESTION_INDEX, default=0) + 1)
+
+def _start_log_listener() -> logging.handlers.QueueListener | None:
+    """Hand this module's records to a background thread for writing.
+
+    Only applies when nothing else has configured ``log``; the request path
+    then just enqueues records instead of writing to stderr itself.
+    """
+    if log.handlers:
+        return None
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(records, handler)
+    log.addHandler(logging.handlers.QueueHandler(records))
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    listener.start()
+    return listener
+
+
+def _stop_log_listener(listener: logging.handlers.QueueListener | None) -> None:
+    if listener is None:
+        return
+    listener.stop()
+    for handler in [h for h in log.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        log.removeHandler(handler)
+    log.propagate = True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one Gemini HTTP client and feedback batcher for the app's lifetime."""
+    listener = _start_log_listener()
+    await main.open_async_client()
+    await start_feedback_batcher()
+    yield
+    await stop_feedback_batcher()
+    await main.close_async_client()
+    _stop_log_listener(listener)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, used as the app-wide default."""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+app = FastAPI(title="ThinkBot API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # serve static files and root index for convenience when deployed
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
@@ -46,11 +266,6 @@ async def favicon() -> FileResponse:
     return FileResponse(STATIC_DIR / "favicon.svg")
 
 
-def normalize_answer(answer: str) -> str:
-    """Normalize answer for comparison by removing extra spaces and converting to lowercase."""
-    return answer.strip().lower()
-
-
 def _is_smart_substring_match(user_answer: str, correct_answer: str) -> bool:
     """Smart substring matching that avoids mathematical false positives."""
     # Don't do substring matching if either answer looks like a number
@@ -97,135 +312,182 @@ def _looks_like_number(text: str) -> bool:
 
 def is_mathematically_equivalent(answer1: str, answer2: str) -> bool:
     """Check if two answers are mathematically equivalent."""
-    # First try exact string match (case insensitive)
-    if normalize_answer(answer1) == normalize_answer(answer2):
+    # Normalize up front so equivalent spellings share one cache entry
+    return _is_equivalent_normalized(normalize_answer(answer1), normalize_answer(answer2))
+
+
+# Numeric answer shapes accepted by float and by Fraction respectively;
+# anything else can never compare equal numerically.
+_DECIMAL_RE = re.compile(r"[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:e[+-]?\d+)?")
+_FRACTION_RE = re.compile(r"[+-]?\d+/\d+")
+
+
+# Longer answers are compared uncached: they are mostly one-off free text and
+# would otherwise let arbitrary user input fill the memo table
+MAX_CACHED_ANSWER_LEN = 64
+
+
+def _is_equivalent_normalized(answer1: str, answer2: str) -> bool:
+    """Compare two already-normalized answers, memoizing short pairs."""
+    if len(answer1) > MAX_CACHED_ANSWER_LEN or len(answer2) > MAX_CACHED_ANSWER_LEN:
+        return _compare_normalized(answer1, answer2)
+    return _compare_normalized_cached(answer1, answer2)
+
+
+def _compare_normalized(answer1: str, answer2: str) -> bool:
+    # First try exact string match
+    if answer1 == answer2:
         return True
     
-    # Try to convert both to numbers and compare
+    # Bail out for non-numeric answers before attempting any parsing
+    is_frac1 = _FRACTION_RE.fullmatch(answer1) is not None
+    if not is_frac1 and _DECIMAL_RE.fullmatch(answer1) is None:
+        return False
+    is_frac2 = _FRACTION_RE.fullmatch(answer2) is not None
+    if not is_frac2 and _DECIMAL_RE.fullmatch(answer2) is None:
+        return False
+    
     try:
         # Handle fractions like "1/2", "1/3", etc.
-        if '/' in answer1 and '/' in answer2:
-            frac1 = Fraction(answer1)
-            frac2 = Fraction(answer2)
-            return frac1 == frac2
+        if is_frac1 and is_frac2:
+            return Fraction(answer1) == Fraction(answer2)
         
-        # Handle decimal numbers (exact match only)
-        try:
-            dec1 = Decimal(answer1)
-            dec2 = Decimal(answer2)
-            if dec1 == dec2:
-                return True
-        except (InvalidOperation, ValueError):
-            pass
+        # One fraction and one decimal
+        if is_frac1:
+            return float(Fraction(answer1)) == float(answer2)
+        if is_frac2:
+            return float(answer1) == float(Fraction(answer2))
         
-        # Try converting one to fraction and one to decimal
-        if '/' in answer1:
-            frac1 = Fraction(answer1)
-            try:
-                dec2 = Decimal(answer2)
-                return float(frac1) == float(dec2)
-            except (InvalidOperation, ValueError):
-                pass
-        elif '/' in answer2:
-            frac2 = Fraction(answer2)
-            try:
-                dec1 = Decimal(answer1)
-                return float(dec1) == float(frac2)
-            except (InvalidOperation, ValueError):
-                pass
+        # Both decimal numbers. Equal values ("2", "2.0", "2e0") parse to the
+        # same float, so one float comparison covers the exact match too
+        value1, value2 = float(answer1), float(answer2)
+        if value1 == value2:
+            return True
         
-        # Try converting both to float for comparison
-        try:
-            float1 = float(answer1)
-            float2 = float(answer2)
-            # Use a more reasonable epsilon for decimal comparisons
-            # This handles cases like 0.2222222222 vs 0.222
-            return abs(float1 - float2) < 1e-3  # 0.001 tolerance for decimal comparisons
-        except (ValueError, TypeError):
-            pass
-            
-    except (ValueError, TypeError, ZeroDivisionError):
-        pass
-    
-    return False
+        # Use a more reasonable epsilon for decimal comparisons
+        # This handles cases like 0.2222222222 vs 0.222
+        return abs(value1 - value2) < 1e-3  # 0.001 tolerance for decimal comparisons
+    except ZeroDivisionError:
+        return False
+
+
+_compare_normalized_cached = lru_cache(maxsize=8192)(_compare_normalized)
+
+# The demo page is streamed from disk by FileResponse (sendfile where the
+# server supports it); repeat visits revalidate against its mtime/size ETag.
+INDEX_FILE = STATIC_DIR / "index.html"
+
 
 @app.get("/", response_class=HTMLResponse)
-def root() -> str:
-    """Return the demo HTML page."""
-    index_path = STATIC_DIR / "index.html"
-    return index_path.read_text(encoding="utf-8")
+async def root(request: Request) -> Response:
+    """Return the demo HTML page, or 304 if the client's copy is current."""
+    response = FileResponse(INDEX_FILE, media_type="text/html", stat_result=INDEX_FILE.stat())
+    etag = response.headers["etag"]
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return response
+
+
+# Every value StudentProfile.engagement_level / learning_pace can take
+_ENGAGEMENT_LEVELS = ("highly_engaged", "engaged", "moderate", "struggling", "disengaged", "learning")
+_LEARNING_PACES = ("fast", "moderate", "slow")
+
+
+def _difficulty_for(engagement: str, pace: str, recent_accuracy: float) -> str:
+    """Adaptive difficulty rules; precomputed into ``_DIFFICULTY_LUT`` below."""
+    if engagement == "struggling" or recent_accuracy < 0.3:
+        return "easy"
+    elif engagement == "highly_engaged" and recent_accuracy > 0.8:
+        return "hard"
+    elif pace == "fast" and recent_accuracy > 0.7:
+        return "hard"
+    elif pace == "slow" and recent_accuracy < 0.6:
+        return "easy"
+    return "medium"
+
 
+def _accuracy_bucket(recent_accuracy: float) -> int:
+    """Map accuracy onto the intervals split by the rule thresholds.
 
-def select_question(profile: StudentProfile, topic: str = None) -> dict:
-    """Select a question with sophisticated adaptation logic."""
+    0: < 0.3, 1: < 0.6, 2: <= 0.7, 3: <= 0.8, 4: > 0.8
+    """
+    return bisect_right((0.3, 0.6), recent_accuracy) + bisect_left((0.7, 0.8), recent_accuracy)
+
+
+# One representative accuracy per bucket, used to build the lookup table
+_BUCKET_SAMPLES = (0.0, 0.3, 0.6, 0.75, 0.9)
+_DIFFICULTY_LUT = {
+    (engagement, pace, bucket): _difficulty_for(engagement, pace, sample)
+    for engagement in _ENGAGEMENT_LEVELS
+    for pace in _LEARNING_PACES
+    for bucket, sample in enumerate(_BUCKET_SAMPLES)
+}
+
+
+_thread_state = threading.local()
+
+
+def _rng() -> random.Random:
+    """Per-thread PRNG so threadpool workers don't share the global instance."""
+    rng = getattr(_thread_state, "rng", None)
+    if rng is None:
+        rng = _thread_state.rng = random.Random()
+    return rng
+
+
+def select_question(profile: StudentProfile, topic: str = None, refills: list | None = None) -> dict:
+    """Select a question with sophisticated adaptation logic.
+
+    When the candidate pool is running low, ``(topic, level)`` is appended to
+    ``refills`` so the caller can generate more questions for it.
+    """
     # Get recent performance (last 5 questions)
-    recent_sessions = profile.learning_sessions[-5:] if len(profile.learning_sessions) >= 5 else profile.learning_sessions
-    recent_accuracy = sum(1 for s in recent_sessions if s['correct']) / len(recent_sessions) if recent_sessions else profile.accuracy
+    recent_sessions = profile.learning_sessions[-5:]
+    recent_accuracy = profile.recent_accuracy(5)
     
     # Consider engagement level and learning pace
     engagement = profile.engagement_level
     pace = profile.learning_pace
     
     # Adaptive difficulty selection
-    if engagement == "struggling" or recent_accuracy < 0.3:
-        level = "easy"
-    elif engagement == "highly_engaged" and recent_accuracy > 0.8:
-        level = "hard"
-    elif pace == "fast" and recent_accuracy > 0.7:
-        level = "hard"
-    elif pace == "slow" and recent_accuracy < 0.6:
-        level = "easy"
-    else:
-        level = "medium"
+    level = _DIFFICULTY_LUT.get((engagement, pace, _accuracy_bucket(recent_accuracy)))
+    if level is None:
+        level = _difficulty_for(engagement, pace, recent_accuracy)
     
-    # Get all questions from the selected level
-    available_questions = QUESTIONS[level].copy()
+    # Get all questions from the selected level; a new list is only built when
+    # recent questions have to be filtered out
+    available_questions = QUESTIONS[level]
     
     # Filter by topic if specified
     if topic:
-        topic_questions = [q for q in available_questions if q.get('topic') == topic]
+        topic_questions = QUESTIONS_BY_TOPIC.get(level, {}).get(topic)
         if topic_questions:
             available_questions = topic_questions
         else:
             # If no questions for this topic at this level, try other levels
             for other_level in ["easy", "medium", "hard"]:
                 if other_level != level:
-                    other_questions = [q for q in QUESTIONS[other_level] if q.get('topic') == topic]
+                    other_questions = QUESTIONS_BY_TOPIC.get(other_level, {}).get(topic)
                     if other_questions:
                         available_questions = other_questions
                         level = other_level
                         break
     
     # Avoid recently asked questions (last 10 questions)
-    recent_question_ids = [s.get('question_id') for s in recent_sessions[-10:] if s.get('question_id')]
-    available_questions = [q for q in available_questions if q['id'] not in recent_question_ids]
+    recent_question_ids = {s.get('question_id') for s in recent_sessions[-10:] if s.get('question_id')}
+    if recent_question_ids:
+        available_questions = [q for q in available_questions if q['id'] not in recent_question_ids]
     
     # If no questions available after filtering, use all questions from level
     if not available_questions:
         available_questions = QUESTIONS[level]
     
-    # Check if we're running low on questions (less than 5 available)
-    if len(available_questions) < 5:
-        # Generate new questions automatically
-        try:
-            generate_new_questions_auto(topic or "general", level)
-            # Reload questions after generation
-            load_questions()
-            # Try to get questions again
-            available_questions = QUESTIONS[level].copy()
-            if topic:
-                available_questions = [q for q in available_questions if q.get('topic') == topic]
-            # Filter out recent questions again
-            available_questions = [q for q in available_questions if q['id'] not in recent_question_ids]
-        except Exception as e:
-            print(f"Failed to generate new questions: {e}")
+    # Running low on questions (less than 5 available): ask the caller to top
+    # up this bucket in the background instead of waiting on the LLM here
+    if len(available_questions) < 5 and refills is not None:
+        refills.append((topic or "general", level))
     
-    # If still no questions available, use all questions from level
-    if not available_questions:
-        available_questions = QUESTIONS[level]
-    
-    q = random.choice(available_questions)
-    return {**q, "difficulty": level}
+    return _rng().choice(available_questions)
 
 
 class AnswerPayload(BaseModel):
@@ -238,36 +500,70 @@ class AnswerPayload(BaseModel):
 
 
 @app.get("/question")
-def get_question(student: str, topic: str = None):
-    profile = StudentProfile.load(student)
-    q = select_question(profile, topic)
-    return {
-        "id": q["id"],
-        "question": q["question"],
-        "difficulty": q["difficulty"],
-        "topic": q.get("topic", "general"),
-        "answer": q["answer"],
-        "explanation": q.get("explanation", ""),
-    }
+async def get_question(student: str, background_tasks: BackgroundTasks, topic: str = None):
+    profile = await run_in_threadpool(StudentProfile.load, student)
+    # Serve questions other workers generated too
+    await run_in_threadpool(_refresh_questions)
+    refills = []
+    q = await run_in_threadpool(select_question, profile, topic, refills)
+    for key in refills:
+        # One generation batch per bucket at a time
+        if key not in _refills_in_flight:
+            _refills_in_flight.add(key)
+            background_tasks.add_task(_refill_questions, *key)
+    return _QUESTION_VIEWS.get(q["id"]) or _question_view(q)
+
+
+# Accepted spellings for specific text answers. Flattened at import into a
+# symmetric index: either side can be the stored answer.
+_ANSWER_VARIATIONS = {
+    "pacific ocean": ["pacific", "pacific ocean"],
+    "atlantic ocean": ["atlantic", "atlantic ocean"],
+    "indian ocean": ["indian", "indian ocean"],
+    "arctic ocean": ["arctic", "arctic ocean"],
+    "southern ocean": ["southern", "southern ocean"],
+    "north america": ["north america", "north american"],
+    "south america": ["south america", "south american"],
+    "united states": ["usa", "us", "united states", "america"],
+    "united kingdom": ["uk", "britain", "united kingdom", "england"],
+    "25π": ["25pi", "25 pi", "25*π", "25 * π"],
+    "36π": ["36pi", "36 pi", "36*π", "36 * π"],
+    "10π": ["10pi", "10 pi", "10*π", "10 * π"],
+    "a² + b² = c²": ["a^2 + b^2 = c^2", "a squared plus b squared equals c squared"],
+}
+
+
+def _build_variation_index(variations: dict) -> dict:
+    index: dict = {}
+    for key, variants in variations.items():
+        index.setdefault(key, set()).update(variants)
+        for variant in variants:
+            index.setdefault(variant, set()).add(key)
+    return {answer: frozenset(accepted) for answer, accepted in index.items()}
+
+
+_VARIATION_INDEX = _build_variation_index(_ANSWER_VARIATIONS)
 
 
 @app.post("/answer")
-def submit_answer(payload: AnswerPayload):
-    profile = StudentProfile.load(payload.student)
+async def submit_answer(payload: AnswerPayload, background_tasks: BackgroundTasks):
+    profile = await run_in_threadpool(StudentProfile.load, payload.student)
     q = QUESTION_INDEX.get(payload.question_id)
+    if q is None:
+        q = await run_in_threadpool(_find_question, payload.question_id)
     if not q:
         raise HTTPException(status_code=404, detail="Unknown question")
     
     # Use mathematical equivalence for numerical answers, exact match for others
-    user_clean = payload.answer.strip().lower()
-    correct_clean = q["answer"].strip().lower()
+    user_clean = normalize_answer(payload.answer)
+    correct_clean = q["answer_norm"]
     
     # Check if this is a numerical answer (contains numbers, fractions, or decimals)
-    is_numerical = any(char.isdigit() or char in './-' for char in user_clean + correct_clean)
+    is_numerical = q["answer_numeric"] or _has_numeric_char(user_clean)
     
     if is_numerical:
         # Use mathematical equivalence for numerical answers
-        correct = is_mathematically_equivalent(payload.answer, q["answer"])
+        correct = _is_equivalent_normalized(user_clean, correct_clean)
     else:
         # Use exact match for non-numerical answers
         correct = user_clean == correct_clean
@@ -281,45 +577,26 @@ def submit_answer(payload: AnswerPayload):
             
             # If still not correct, check specific hardcoded variations
             if not correct:
-                variations = {
-                    "pacific ocean": ["pacific", "pacific ocean"],
-                    "atlantic ocean": ["atlantic", "atlantic ocean"],
-                    "indian ocean": ["indian", "indian ocean"],
-                    "arctic ocean": ["arctic", "arctic ocean"],
-                    "southern ocean": ["southern", "southern ocean"],
-                    "north america": ["north america", "north american"],
-                    "south america": ["south america", "south american"],
-                    "united states": ["usa", "us", "united states", "america"],
-                    "united kingdom": ["uk", "britain", "united kingdom", "england"],
-                    "25π": ["25pi", "25 pi", "25*π", "25 * π"],
-                    "36π": ["36pi", "36 pi", "36*π", "36 * π"],
-                    "10π": ["10pi", "10 pi", "10*π", "10 * π"],
-                    "a² + b² = c²": ["a^2 + b^2 = c^2", "a squared plus b squared equals c squared"],
-                }
-                
-                for correct_key, variants in variations.items():
-                    if correct_clean == correct_key:
-                        if user_clean in variants:
-                            correct = True
-                            break
-                    elif user_clean == correct_key:
-                        if correct_clean in variants:
-                            correct = True
-                            break
-    
-    # Record comprehensive session data with enhanced engagement tracking
-    profile.record_session(
+                correct = user_clean in _VARIATION_INDEX.get(correct_clean, ())
+    
+    # Record comprehensive session data with enhanced engagement tracking.
+    # The profile is written to disk after the response is sent; until then
+    # this worker's profile cache serves the updated copy.
+    await run_in_threadpool(
+        profile.record_session,
         question_id=payload.question_id,
         difficulty=q["difficulty"],
         answer=payload.answer,
         correct=correct,
         response_time=payload.response_time,
         answer_changes=payload.answer_changes,
-        hints_used=payload.hints_used
+        hints_used=payload.hints_used,
+        save=False,
     )
+    background_tasks.add_task(profile.save)
     
     # Generate personalized feedback based on learning profile
-    feedback = generate_personalized_feedback(profile, q, payload, correct)
+    feedback = await generate_personalized_feedback(profile, q, payload, correct)
     
     # Determine next action based on performance
     next_action = determine_next_action(profile, correct)
@@ -335,10 +612,216 @@ def submit_answer(payload: AnswerPayload):
         "insights": profile.get_learning_insights()
     }
 
-def generate_personalized_feedback(profile: StudentProfile, question: dict, payload: AnswerPayload, correct: bool) -> str:
+# Static tutor instructions shared by every feedback request. Sent as the
+# Gemini system instruction (ahead of the per-student details) so the prefix
+# stays identical across calls and can be reused from Gemini's prompt cache.
+FEEDBACK_SYSTEM_PROMPT = """
+You are ThinkBot, a patient and encouraging tutor giving feedback on a quiz answer.
+Each request contains a Student Profile (name, learning style, engagement level,
+learning pace, current accuracy, response time and hints used) followed by the
+question, the student's answer, the correct answer, its difficulty and topic,
+and a final instruction describing the tone of feedback to give.
+Address the student by name, keep the feedback short and specific to the
+question, and follow the final instruction.
+"""
+
+# In-memory LRU of generated feedback so repeated identical situations (same
+# question, same answer, same profile bucket) skip the Gemini round-trip.
+FEEDBACK_CACHE_SIZE = 4096
+FEEDBACK_CACHE_TTL = 24 * 60 * 60  # seconds
+_feedback_cache: "OrderedDict[tuple, tuple[float, str]]" = OrderedDict()
+
+
+def _feedback_answer_key(answer: str) -> str:
+    """Order- and case-insensitive form of an answer for the feedback cache.
+
+    "Pacific  Ocean" and "ocean pacific" share an entry.
+    """
+    return " ".join(sorted(answer.casefold().split()))
+
+
+def _feedback_cache_get(key: tuple) -> str | None:
+    entry = _feedback_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, feedback = entry
+    if time.monotonic() - stored_at > FEEDBACK_CACHE_TTL:
+        del _feedback_cache[key]
+        return None
+    _feedback_cache.move_to_end(key)
+    return feedback
+
+
+def _feedback_cache_put(key: tuple, feedback: str) -> None:
+    # Don't cache placeholder/error strings returned by call_llm
+    if feedback.startswith("[Gemini"):
+        return
+    _feedback_cache[key] = (time.monotonic(), feedback)
+    _feedback_cache.move_to_end(key)
+    if len(_feedback_cache) > FEEDBACK_CACHE_SIZE:
+        _feedback_cache.popitem(last=False)
+
+
+# Feedback requests arriving within FEEDBACK_BATCH_WINDOW seconds of each other
+# are coalesced (up to FEEDBACK_BATCH_SIZE) into a single Gemini call.
+FEEDBACK_BATCH_SIZE = 8
+FEEDBACK_BATCH_WINDOW = 0.25  # seconds
+_feedback_queue: asyncio.Queue | None = None
+_feedback_worker: asyncio.Task | None = None
+_feedback_dispatches: set = set()
+# Reply for requests still waiting when the batcher stops; the "[Gemini"
+# prefix keeps it out of the feedback cache like other placeholder replies
+FEEDBACK_SHUTDOWN_REPLY = "[Gemini request cancelled: server shutting down]"
+
+
+async def start_feedback_batcher() -> None:
+    """Start the background task that batches feedback prompts."""
+    global _feedback_queue, _feedback_worker
+    if _feedback_worker is None:
+        _feedback_queue = asyncio.Queue()
+        _feedback_worker = asyncio.create_task(_feedback_batch_loop(_feedback_queue))
+
+
+async def stop_feedback_batcher() -> None:
+    """Stop the batching task; later feedback requests call Gemini directly.
+
+    Requests still queued or in flight get ``FEEDBACK_SHUTDOWN_REPLY``.
+    """
+    global _feedback_queue, _feedback_worker
+    if _feedback_worker is not None:
+        _feedback_worker.cancel()
+        try:
+            await _feedback_worker
+        except asyncio.CancelledError:
+            pass
+        pending = []
+        while not _feedback_queue.empty():
+            pending.append(_feedback_queue.get_nowait())
+        _resolve_feedback(pending, FEEDBACK_SHUTDOWN_REPLY)
+        dispatches = list(_feedback_dispatches)
+        for task in dispatches:
+            task.cancel()
+        await asyncio.gather(*dispatches, return_exceptions=True)
+        _feedback_queue = _feedback_worker = None
+
+
+def _resolve_feedback(batch: list[tuple[str, asyncio.Future]], reply: str) -> None:
+    for _, fut in batch:
+        if not fut.done():
+            fut.set_result(reply)
+
+
+async def _feedback_batch_loop(queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = []
+        try:
+            batch.append(await queue.get())
+            deadline = loop.time() + FEEDBACK_BATCH_WINDOW
+            while len(batch) < FEEDBACK_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except asyncio.CancelledError:
+            # Stopped mid-collection: answer what was already taken off the queue
+            _resolve_feedback(batch, FEEDBACK_SHUTDOWN_REPLY)
+            raise
+        # Dispatch without blocking collection of the next batch
+        task = asyncio.create_task(_dispatch_feedback_batch(batch))
+        _feedback_dispatches.add(task)
+        task.add_done_callback(_feedback_dispatches.discard)
+
+
+def _build_batch_prompt(prompts: list[str]) -> str:
+    items = "\n".join(f"### Item {i}\n{p}" for i, p in enumerate(prompts, 1))
+    return (
+        f"Give feedback for each of the following {len(prompts)} independent items.\n"
+        f"Return only a JSON object mapping each item number (\"1\" to \"{len(prompts)}\") "
+        f"to its feedback text.\n\n{items}"
+    )
+
+
+def _parse_batch_feedback(text: str, count: int) -> list[str] | None:
+    """Split a batched reply into per-item feedback, or ``None`` if malformed."""
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        if text.startswith("json"):
+            text = text[len("json"):]
+        text = text.strip()
+    try:
+        replies = orjson.loads(text)
+        return [str(replies[str(i)]) for i in range(1, count + 1)]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+async def _single_feedback(prompt: str) -> str:
+    return await call_llm_async(
+        [{"role": "user", "content": prompt}], system_instruction=FEEDBACK_SYSTEM_PROMPT
+    )
+
+
+async def _dispatch_feedback_batch(batch: list[tuple[str, asyncio.Future]]) -> None:
+    prompts = [prompt for prompt, _ in batch]
+    try:
+        if len(prompts) == 1:
+            replies = [await _single_feedback(prompts[0])]
+        else:
+            text = await call_llm_async(
+                [{"role": "user", "content": _build_batch_prompt(prompts)}],
+                system_instruction=FEEDBACK_SYSTEM_PROMPT,
+            )
+            if text.startswith("[Gemini"):
+                replies = [text] * len(prompts)
+            else:
+                replies = _parse_batch_feedback(text, len(prompts))
+                if replies is None:
+                    # Fall back to one call per item if the batch reply is unusable
+                    replies = await asyncio.gather(*(_single_feedback(p) for p in prompts))
+    except asyncio.CancelledError:
+        _resolve_feedback(batch, FEEDBACK_SHUTDOWN_REPLY)
+        raise
+    except Exception as exc:
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(exc)
+        return
+    for (_, fut), reply in zip(batch, replies):
+        if not fut.done():
+            fut.set_result(reply)
+
+
+async def _request_feedback(prompt: str) -> str:
+    """Queue ``prompt`` for batched feedback, or call Gemini directly if idle."""
+    if _feedback_queue is None:
+        return await _single_feedback(prompt)
+    fut = asyncio.get_running_loop().create_future()
+    await _feedback_queue.put((prompt, fut))
+    return await fut
+
+
+async def generate_personalized_feedback(profile: StudentProfile, question: dict, payload: AnswerPayload, correct: bool) -> str:
     """Generate personalized feedback based on student profile and performance."""
     
-    # Base prompt with context
+    # The prompt addresses the student by name, so the name is part of the key
+    cache_key = (
+        profile.name,
+        question["id"],
+        correct,
+        profile.engagement_level,
+        profile.learning_style,
+        _feedback_answer_key(payload.answer),
+    )
+    cached = _feedback_cache_get(cache_key)
+    if cached is not None:
+        return cached
+    
+    # Per-request details; the static instructions live in FEEDBACK_SYSTEM_PROMPT
     base_context = f"""
     Student Profile:
     - Name: {profile.name}
@@ -375,60 +858,103 @@ def generate_personalized_feedback(profile: StudentProfile, question: dict, payl
         else:
             prompt = base_context + "\nProvide clear, detailed explanation of the correct approach and encourage trying again."
     
-    return call_llm([{"role": "user", "content": prompt}])
+    feedback = await _request_feedback(prompt)
+    _feedback_cache_put(cache_key, feedback)
+    return feedback
+
+# Engagement-specific actions take precedence over pace-based ones
+_ENGAGEMENT_ACTIONS = {
+    ("struggling", True): "encouraged_practice",  # Continue with easier questions
+    ("struggling", False): "guided_learning",  # Provide more hints and guidance
+    ("highly_engaged", True): "challenge_mode",  # Offer harder questions or bonus challenges
+    ("highly_engaged", False): "focused_review",  # Review the concept with detailed explanation
+}
+_PACE_ACTIONS = {
+    ("fast", True): "accelerated_learning",  # Move to next topic or harder questions
+    ("slow", False): "reinforcement",  # Provide more practice with similar questions
+}
+
+# Flattened (engagement_level, learning_pace, correct) -> action table
+_NEXT_ACTION = {
+    (engagement, pace, correct): (
+        _ENGAGEMENT_ACTIONS.get((engagement, correct))
+        or _PACE_ACTIONS.get((pace, correct), "continue_learning")
+    )
+    for engagement in _ENGAGEMENT_LEVELS
+    for pace in _LEARNING_PACES
+    for correct in (True, False)
+}
+
 
 def determine_next_action(profile: StudentProfile, correct: bool) -> str:
     """Determine the next learning action based on student performance."""
-    
-    if profile.engagement_level == "struggling":
-        if correct:
-            return "encouraged_practice"  # Continue with easier questions
-        else:
-            return "guided_learning"  # Provide more hints and guidance
-    
-    elif profile.engagement_level == "highly_engaged":
-        if correct:
-            return "challenge_mode"  # Offer harder questions or bonus challenges
-        else:
-            return "focused_review"  # Review the concept with detailed explanation
-    
-    elif profile.learning_pace == "fast" and correct:
-        return "accelerated_learning"  # Move to next topic or harder questions
-    
-    elif profile.learning_pace == "slow" and not correct:
-        return "reinforcement"  # Provide more practice with similar questions
-    
-    else:
-        return "continue_learning"  # Normal progression
+    return _NEXT_ACTION.get(
+        (profile.engagement_level, profile.learning_pace, correct), "continue_learning"
+    )
+
+# Hints and per-student analytics are revalidated by ETag; clients may reuse
+# them for a minute without asking
+_REVALIDATE_CACHE_CONTROL = "private, max-age=60"
+
 
 @app.get("/analytics/{student}")
-def get_student_analytics(student: str):
+async def get_student_analytics(student: str, request: Request):
     """Get comprehensive learning analytics for a student."""
-    profile = StudentProfile.load(student)
-    return profile.get_learning_insights()
+    etag = await run_in_threadpool(_profile_etag, student)
+    if etag is None:
+        profile = await run_in_threadpool(StudentProfile.load, student)
+        return profile.get_learning_insights()
+    headers = {"ETag": etag, "Cache-Control": _REVALIDATE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    profile = await run_in_threadpool(StudentProfile.load, student)
+    return ORJSONResponse(profile.get_learning_insights(), headers=headers)
+
+
+def _profile_etag(student: str) -> str | None:
+    """Weak ETag for a stored profile's current contents, or None if unsaved."""
+    try:
+        st = (main.DATA_DIR / f"student_{student}.json").stat()
+    except FileNotFoundError:
+        return None
+    return f'W/"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
 
 @app.get("/analytics")
-def get_all_analytics():
+async def get_all_analytics():
     """Get analytics for all students (teacher dashboard)."""
-    import os
-    from pathlib import Path
-    
-    analytics = []
-    # Look for student files in the data directory (where StudentProfile saves them)
-    data_dir = Path("data")
-    
-    if data_dir.exists():
-        for file_path in data_dir.glob("student_*.json"):
-            student_name = file_path.stem.replace("student_", "")
-            try:
-                profile = StudentProfile.load(student_name)
-                insights = profile.get_learning_insights()
-                # Ensure we have the student name in the insights
-                insights["name"] = student_name
-                analytics.append(insights)
-            except Exception as e:
-                print(f"Error loading profile for {student_name}: {e}")
-                continue
+    return await run_in_threadpool(_collect_all_analytics)
+
+
+# Dashboard rows as last read from the analytics index: ((mtime_ns, size), rows)
+_analytics_cache: tuple[tuple[int, int], list] | None = None
+
+
+def _analytics_index_stamp() -> tuple[int, int] | None:
+    try:
+        st = main.analytics_index_path().stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _collect_all_analytics() -> dict:
+    """Read the analytics index and build the dashboard summary."""
+    global _analytics_cache
+    stamp = _analytics_index_stamp()
+    if stamp is not None and _analytics_cache is not None and _analytics_cache[0] == stamp:
+        analytics = _analytics_cache[1]
+    else:
+        try:
+            analytics = list(main.load_analytics_index().values())
+        except Exception as e:
+            log.exception("failed to load analytics index")
+            analytics = []
+        else:
+            # Loading may have built or compacted the file, so stamp it afterwards
+            stamp = _analytics_index_stamp()
+            if stamp is not None:
+                _analytics_cache = (stamp, analytics)
     
     # If no student files found, return empty analytics
     if not analytics:
@@ -442,31 +968,48 @@ def get_all_analytics():
             }
         }
     
+    # Single pass over the insights; accuracy is stored as a percentage
+    high_performers = struggling_students = 0
+    total_accuracy = 0.0
+    for s in analytics:
+        accuracy = s.get("accuracy", 0)
+        total_accuracy += accuracy
+        if accuracy > 80:
+            high_performers += 1
+        if s.get("needs_attention", False):
+            struggling_students += 1
+    
     return {
         "total_students": len(analytics),
         "students": analytics,
         "summary": {
-            "high_performers": len([s for s in analytics if s.get("accuracy", 0) > 0.8]),
-            "struggling_students": len([s for s in analytics if s.get("needs_attention", False)]),
-            "average_accuracy": sum(s.get("accuracy", 0) for s in analytics) / len(analytics) if analytics else 0
+            "high_performers": high_performers,
+            "struggling_students": struggling_students,
+            "average_accuracy": total_accuracy / len(analytics)
         }
     }
 
 
+def _delete_student_data(student_name: str) -> bool:
+    """Remove a student's profile file and dashboard row; False if none existed."""
+    student_file = main.DATA_DIR / f"student_{student_name}.json"
+    try:
+        student_file.unlink()
+    except FileNotFoundError:
+        return False
+    try:
+        (main.DATA_DIR / f"student_{student_name}.jsonl").unlink()
+    except FileNotFoundError:
+        pass
+    main.forget_student_analytics(student_name)
+    return True
+
+
 @app.delete("/clear-student/{student_name}")
-def clear_student_data(student_name: str):
+async def clear_student_data(student_name: str):
     """Clear all data for a specific student."""
     try:
-        from pathlib import Path
-        import os
-        
-        # Look for student file in the data directory
-        data_dir = Path("data")
-        student_file = data_dir / f"student_{student_name}.json"
-        
-        if student_file.exists():
-            # Delete the student profile file
-            student_file.unlink()
+        if await run_in_threadpool(_delete_student_data, student_name):
             return {"message": f"Successfully cleared data for student: {student_name}"}
         else:
             return {"message": f"No data found for student: {student_name}"}
@@ -474,31 +1017,48 @@ def clear_student_data(student_name: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing student data: {str(e)}")
 
-@app.get("/hint/{question_id}")
-def get_hint(question_id: int):
-    """Get a hint for a specific question."""
-    q = QUESTION_INDEX.get(question_id)
-    if not q:
-        raise HTTPException(status_code=404, detail="Question not found")
-    
-    return {
+def _hint_body(question_id: int, q: dict) -> bytes:
+    return orjson.dumps({
         "question_id": question_id,
         "hint": q.get("hint", "No hint available"),
         "topic": q.get("topic", "general")
-    }
+    })
+
+
+# Hints never change for a given question, so responses are encoded once.
+# Generated questions are encoded on first request; load_questions rebuilds.
+_HINT_RESPONSES = {qid: _hint_body(qid, q) for qid, q in QUESTION_INDEX.items()}
+
+
+@app.get("/hint/{question_id}")
+def get_hint(question_id: int, request: Request):
+    """Get a hint for a specific question."""
+    body = _HINT_RESPONSES.get(question_id)
+    if body is None:
+        q = _find_question(question_id)
+        if not q:
+            raise HTTPException(status_code=404, detail="Question not found")
+        body = _HINT_RESPONSES[question_id] = _hint_body(question_id, q)
+    # Derived from the body itself, so every worker tags the same hint alike
+    etag = f'W/"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": _REVALIDATE_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/end-quiz-session")
-def end_quiz_session(student: str):
+async def end_quiz_session(student: str):
     """End a quiz session for a student."""
     try:
-        profile = StudentProfile.load(student)
-        profile.end_quiz_session()
+        profile = await run_in_threadpool(StudentProfile.load, student)
+        await run_in_threadpool(profile.end_quiz_session)
         return {"message": "Quiz session ended", "quiz_sessions": profile.quiz_sessions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error ending quiz session: {str(e)}")
 
 @app.post("/generate-questions")
-def generate_new_questions(topic: str = None, count: int = 5):
+async def generate_new_questions(topic: str = None, count: int = 5):
     """Generate new questions using LLM API."""
     try:
         # Create a prompt for generating questions
@@ -524,36 +1084,17 @@ def generate_new_questions(topic: str = None, count: int = 5):
         """
         
         # Call LLM to generate questions
-        response = call_llm(prompt)
+        response = await call_llm_async([{"role": "user", "content": prompt}])
         
         # Parse the response (assuming it returns valid JSON)
-        import json
         try:
-            questions = json.loads(response)
+            questions = orjson.loads(response)
             if not isinstance(questions, list):
                 questions = [questions]
             
-            # Add unique IDs and save to questions file
-            new_questions = []
-            max_id = max([q.get('id', 0) for level_questions in QUESTIONS.values() for q in level_questions], default=0)
-            for i, q in enumerate(questions):
-                q["id"] = max_id + i + 1
-                new_questions.append(q)
-            
-            # Update the questions file
-            difficulty = new_questions[0].get("difficulty", "medium")
-            if difficulty not in QUESTIONS:
-                QUESTIONS[difficulty] = []
-            
-            QUESTIONS[difficulty].extend(new_questions)
-            
-            # Update question index
-            for q in new_questions:
-                QUESTION_INDEX[q["id"]] = {**q, "difficulty": difficulty}
-            
-            # Save to file
-            with QUESTIONS_FILE.open("w", encoding="utf-8") as fh:
-                json.dump(QUESTIONS, fh, indent=2)
+            # Add unique IDs, update the indexes and save to questions file
+            difficulty = questions[0].get("difficulty", "medium")
+            new_questions = await run_in_threadpool(_add_questions, difficulty, questions)
             
             return {
                 "message": f"Generated {len(new_questions)} new questions",
@@ -561,14 +1102,25 @@ def generate_new_questions(topic: str = None, count: int = 5):
                 "topic": topic or "general"
             }
             
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             return {"error": "Failed to parse LLM response as JSON"}
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating questions: {str(e)}")
 
 
-def generate_new_questions_auto(topic: str, level: str, count: int = 10):
+# (topic, level) buckets with a background generation batch running
+_refills_in_flight: set = set()
+
+
+async def _refill_questions(topic: str, level: str) -> None:
+    try:
+        await generate_new_questions_auto(topic, level)
+    finally:
+        _refills_in_flight.discard((topic, level))
+
+
+async def generate_new_questions_auto(topic: str, level: str, count: int = 10):
     """Automatically generate new questions when the question bank runs low."""
     try:
         # Create a prompt for generating questions
@@ -588,53 +1140,65 @@ def generate_new_questions_auto(topic: str, level: str, count: int = 10):
         Include variety in question types and formats."""
         
         # Call the LLM to generate questions
-        response = call_llm(prompt)
+        response = await call_llm_async([{"role": "user", "content": prompt}])
         
         # Parse the JSON response
         if response.startswith('[') and response.endswith(']'):
-            new_questions = json.loads(response)
-            
-            # Add unique IDs to the questions
-            max_id = max([q.get('id', 0) for level_questions in QUESTIONS.values() for q in level_questions], default=0)
-            for i, question in enumerate(new_questions):
-                question['id'] = max_id + i + 1
-            
-            # Add to the appropriate level
-            QUESTIONS[level].extend(new_questions)
+            new_questions = orjson.loads(response)
             
-            # Update question index
-            for q in new_questions:
-                QUESTION_INDEX[q["id"]] = {**q, "difficulty": level}
+            # Add unique IDs, update the indexes and save to the questions file
+            await run_in_threadpool(_add_questions, level, new_questions)
             
-            # Save updated questions to file
-            with QUESTIONS_FILE.open("w", encoding="utf-8") as fh:
-                json.dump(QUESTIONS, fh, indent=2)
-            
-            print(f"Generated {len(new_questions)} new {level} questions for topic '{topic}'")
+            log.info("generated %d new %s questions for topic %r", len(new_questions), level, topic)
             return True
         else:
-            print(f"Failed to parse LLM response for question generation: {response}")
+            log.warning("failed to parse LLM response for question generation: %s", response)
             return False
             
     except Exception as e:
-        print(f"Error generating new questions: {e}")
+        log.exception("failed to generate new questions")
         return False
 
 
+def _refresh_questions() -> None:
+    """Pick up a bank another worker rewrote since this one last read it."""
+    try:
+        mtime = QUESTIONS_FILE.stat().st_mtime_ns
+    except OSError:
+        return
+    if mtime != _questions_mtime:
+        with _questions_file_lock:
+            load_questions()
+
+
+def _find_question(question_id: int) -> dict | None:
+    """``QUESTION_INDEX`` lookup that reloads the bank once on a miss.
+
+    An id this worker doesn't know may belong to questions another worker
+    generated; only after the reload is it really unknown.
+    """
+    q = QUESTION_INDEX.get(question_id)
+    if q is None:
+        _refresh_questions()
+        q = QUESTION_INDEX.get(question_id)
+    return q
+
+
 def load_questions():
-    """Reload questions from JSON file."""
-    global QUESTIONS, QUESTION_INDEX
+    """Reload questions from JSON file if it changed since we last read or wrote it."""
+    global QUESTIONS, _HINT_RESPONSES, _question_ids, _questions_mtime
     try:
-        with QUESTIONS_FILE.open("r", encoding="utf-8") as fh:
-            _raw_questions = json.load(fh)
+        mtime = QUESTIONS_FILE.stat().st_mtime_ns
+        if mtime == _questions_mtime:
+            return True
+        _raw_questions = orjson.loads(QUESTIONS_FILE.read_bytes())
+        _questions_mtime = mtime
         
-        QUESTIONS = {level: qs for level, qs in _raw_questions.items()}
-        QUESTION_INDEX = {
-            q["id"]: {**q, "difficulty": level}
-            for level, qs in QUESTIONS.items()
-            for q in qs
-        }
+        QUESTIONS = {level: tuple(qs) for level, qs in _raw_questions.items()}
+        _rebuild_indexes()
+        _question_ids = itertools.count(max(QUESTION_INDEX, default=0) + 1)
+        _HINT_RESPONSES = {qid: _hint_body(qid, q) for qid, q in QUESTION_INDEX.items()}
         return True
     except Exception as e:
-        print(f"Error loading questions: {e}")
+        log.exception("failed to reload questions")
         return False
@@ -7,62 +7,218 @@ keep resource usage low for free-tier hosting such as Vercel's hobby plan.
 
 from __future__ import annotations
 
-import json
+import functools
 import os
-from dataclasses import asdict, dataclass
+import sys
+import tempfile
+import threading
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from datetime import datetime
 from pathlib import Path
 from typing import List
 
-import requests
+import httpx
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX hosts
+    fcntl = None
 
 
 # Directory where student progress JSON files are stored
 DATA_DIR = Path("data")
 
+# Loaded profiles keyed by file path -> ((mtime_ns, size), profile), least
+# recently used first. A stamp mismatch means another worker wrote the file,
+# so it is re-read.
+PROFILE_CACHE_SIZE = 1024
+_profile_cache: OrderedDict = OrderedDict()
+
+# Append-only log of dashboard rows, one JSON object per line. ``save`` appends
+# the student's current insights; the newest line per name wins and a line with
+# ``"deleted": true`` drops the student. Compacted on read once it is mostly
+# superseded rows.
+ANALYTICS_INDEX_NAME = "_analytics_index.jsonl"
+# Appends, compaction and seeding hold _analytics_lock: the thread lock plus an
+# flock on this sidecar file, so threadpool saves and other workers queue
+ANALYTICS_LOCK_NAME = ANALYTICS_INDEX_NAME + ".lock"
+_analytics_thread_lock = threading.Lock()
+# Rows this process appended since it last read the index back; past
+# ANALYTICS_COMPACT_EVERY the writer itself compacts, so the file stays bounded
+# even when no dashboard reads it
+ANALYTICS_COMPACT_EVERY = 256
+_analytics_appends = 0
+
+# Sessions kept in ``StudentProfile.learning_sessions``; the heuristics look at
+# most 20 back and the full history stays in the per-student session log.
+# Must cover RECENT_MASK_BITS so the mask can be rebuilt on load.
+SESSION_WINDOW = 64
+
+# Number of most recent answers tracked in ``StudentProfile.recent_correct_mask``
+RECENT_MASK_BITS = 64
+
+# Score/seconds cut-offs and the label for each band: a value equal to a
+# cut-off falls in the band above it
+_ENGAGEMENT_THRESHOLDS = (35, 55, 70, 85)
+_ENGAGEMENT_LEVELS = ("disengaged", "struggling", "moderate", "engaged", "highly_engaged")
+_PACE_THRESHOLDS = (20, 60)
+_PACES = ("fast", "moderate", "slow")
+
+# Topics whose results feed the visual and auditory learning-style scores
+_VISUAL_TOPICS = frozenset(("geometry", "colors", "patterns"))
+_WORD_TOPICS = frozenset(("geography", "language", "word_problems"))
+
 
 # Gemini configuration
 GEMINI_MODEL = "gemini-2.5-flash"
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+GEMINI_TIMEOUT = 15
+GEMINI_URL = (
+    f"https://generativelanguage.googleapis.com/v1beta/models/"
+    f"{GEMINI_MODEL}:generateContent"
+)
+# Disables "thinking" to conserve free-tier quota; shared by every payload,
+# which is encoded straight away and never mutated
+_GENERATION_CONFIG = {"thinkingConfig": {"thinkingBudget": 0}}
+
+# Keep-alive session for the synchronous ``call_llm`` so repeat calls skip the
+# TCP/TLS handshake. Created on first use so importing this module (a cold
+# start on serverless hosts) doesn't pay for importing ``requests``.
+_session = None
+
+# Shared async client, opened/closed by the FastAPI lifespan in ``api``
+_async_client: httpx.AsyncClient | None = None
+
+
+def _gemini_headers() -> dict:
+    # The key goes in a header rather than ``?key=`` so the URL stays constant
+    # and never shows up in HTTP errors or access logs. Bodies are encoded
+    # with orjson up front rather than by the client's stdlib json encoder.
+    return {"Content-Type": "application/json", "x-goog-api-key": GEMINI_API_KEY}
+
+
+def _gemini_payload(messages: List[dict], system_instruction: str | None = None) -> dict:
+    payload = {
+        "contents": [
+            {"role": m["role"], "parts": [{"text": m["content"]}]} for m in messages
+        ],
+        "generationConfig": _GENERATION_CONFIG,
+    }
+    if system_instruction:
+        # Kept ahead of the contents so repeated prompts share a cacheable prefix
+        payload["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+    return payload
 
 
-def call_llm(messages: List[dict]) -> str:
+def _extract_text(data: dict) -> str:
+    return (
+        data.get("candidates", [{}])[0]
+        .get("content", {})
+        .get("parts", [{}])[0]
+        .get("text", "")
+    )
+
+
+def _request_failed(exc: Exception) -> str:
+    # Hide API key from error messages, should a library or proxy echo it back
+    error_msg = str(exc)
+    if GEMINI_API_KEY:
+        error_msg = error_msg.replace(GEMINI_API_KEY, "***HIDDEN***")
+    return f"[Gemini request failed: {error_msg}]"
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import requests
+        from urllib3.util.retry import Retry
+
+        # Retry transient server errors only: a 429 means the free-tier quota
+        # is spent and won't recover within the backoff
+        retry = Retry(
+            total=2, backoff_factor=0.2, status_forcelist=(500, 502, 503, 504),
+            allowed_methods=None, raise_on_status=False,
+        )
+        session = requests.Session()
+        session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry),
+        )
+        _session = session
+    return _session
+
+
+def call_llm(messages: List[dict], system_instruction: str | None = None) -> str:
     """Call Gemini via its REST API and return the text response.
 
     ``messages`` uses the familiar ``{"role": ..., "content": ...}`` format.
     To conserve free-tier quotas we disable the "thinking" feature by setting
-    the ``thinkingBudget`` to zero.
+    the ``thinkingBudget`` to zero. A static ``system_instruction`` is sent
+    as Gemini's ``systemInstruction`` so it can be served from the implicit
+    prompt cache across calls.
     """
 
     if not GEMINI_API_KEY:
         return "[Gemini API key not set]"
 
-    url = (
-        f"https://generativelanguage.googleapis.com/v1beta/models/"
-        f"{GEMINI_MODEL}:generateContent"
-    )
-    payload = {
-        "contents": [
-            {"role": m["role"], "parts": [{"text": m["content"]}]} for m in messages
-        ],
-        "generationConfig": {"thinkingConfig": {"thinkingBudget": 0}},
-    }
-    params = {"key": GEMINI_API_KEY}
+    body = orjson.dumps(_gemini_payload(messages, system_instruction))
     try:
-        r = requests.post(url, params=params, json=payload, timeout=15)
-        r.raise_for_status()
-        data = r.json()
-        return (
-            data.get("candidates", [{}])[0]
-            .get("content", {})
-            .get("parts", [{}])[0]
-            .get("text", "")
+        r = _get_session().post(
+            GEMINI_URL, data=body, headers=_gemini_headers(), timeout=GEMINI_TIMEOUT
         )
+        r.raise_for_status()
+        return _extract_text(orjson.loads(r.content))
     except Exception as exc:  # pragma: no cover - network errors
-        # Hide API key from error messages
-        error_msg = str(exc)
-        if "key=" in error_msg:
-            error_msg = error_msg.split("key=")[0] + "key=***HIDDEN***"
-        return f"[Gemini request failed: {error_msg}]"
+        return _request_failed(exc)
+
+
+async def open_async_client() -> None:
+    """Create the shared ``httpx.AsyncClient`` used by :func:`call_llm_async`."""
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=GEMINI_TIMEOUT)
+
+
+async def close_async_client() -> None:
+    """Close the shared ``httpx.AsyncClient`` if it was opened."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+async def call_llm_async(
+    messages: List[dict], system_instruction: str | None = None
+) -> str:
+    """Async variant of :func:`call_llm` for use inside FastAPI handlers.
+
+    Reuses the module-level client when the app lifespan has opened it so
+    concurrent requests share one connection pool; otherwise falls back to a
+    short-lived client.
+    """
+
+    if not GEMINI_API_KEY:
+        return "[Gemini API key not set]"
+
+    body = orjson.dumps(_gemini_payload(messages, system_instruction))
+    try:
+        if _async_client is not None:
+            r = await _async_client.post(
+                GEMINI_URL, content=body, headers=_gemini_headers()
+            )
+        else:
+            async with httpx.AsyncClient(timeout=GEMINI_TIMEOUT) as client:
+                r = await client.post(
+                    GEMINI_URL, content=body, headers=_gemini_headers()
+                )
+        r.raise_for_status()
+        return _extract_text(orjson.loads(r.content))
+    except Exception as exc:  # pragma: no cover - network errors
+        return _request_failed(exc)
 
 
 
@@ -71,6 +227,114 @@ def call_llm(messages: List[dict]) -> str:
 # ---------------------------------------------------------------------------
 
 
+# Data directories already created by this process
+_ready_dirs: set = set()
+
+
+def _ensure_data_dir() -> None:
+    """Create ``DATA_DIR`` on first use instead of calling mkdir on every save."""
+    if DATA_DIR not in _ready_dirs:
+        DATA_DIR.mkdir(exist_ok=True)
+        _ready_dirs.add(DATA_DIR)
+
+
+def analytics_index_path() -> Path:
+    return DATA_DIR / ANALYTICS_INDEX_NAME
+
+
+@contextmanager
+def _analytics_lock():
+    """Hold the analytics-index lock across threads and, where fcntl exists, processes."""
+    with _analytics_thread_lock:
+        if fcntl is None:
+            yield
+            return
+        _ensure_data_dir()
+        with (DATA_DIR / ANALYTICS_LOCK_NAME).open("a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _analytics_row(profile: "StudentProfile") -> dict:
+    """The dashboard row for ``profile``: its insights minus the session list."""
+    row = profile.get_learning_insights()
+    del row["learning_sessions"]
+    row["name"] = profile.name
+    return row
+
+
+def _append_analytics_rows(rows: List[dict]) -> None:
+    global _analytics_appends
+    with _analytics_lock():
+        path = analytics_index_path()
+        if not path.exists():
+            # No index yet: seed it from the profiles on disk, which already
+            # reflect the change being recorded
+            _load_analytics_index()
+            return
+        with path.open("ab") as fh:
+            fh.write(b"".join(orjson.dumps(row) + b"\n" for row in rows))
+        _analytics_appends += len(rows)
+        if _analytics_appends >= ANALYTICS_COMPACT_EVERY:
+            _load_analytics_index()
+
+
+def forget_student_analytics(name: str) -> None:
+    """Drop ``name`` from the analytics index."""
+    _append_analytics_rows([{"name": name, "deleted": True}])
+
+
+def load_analytics_index() -> dict:
+    """Return the latest dashboard row per student name.
+
+    Builds the index from the stored profiles the first time, and rewrites it
+    without superseded rows when they outnumber the live ones.
+    """
+    with _analytics_lock():
+        return _load_analytics_index()
+
+
+def _load_analytics_index() -> dict:
+    """``load_analytics_index`` body; callers hold ``_analytics_lock``."""
+    global _analytics_appends
+    _analytics_appends = 0
+    try:
+        with analytics_index_path().open("rb") as fh:
+            lines = fh.readlines()
+    except FileNotFoundError:
+        rows = {}
+        for file_path in DATA_DIR.glob("student_*.json"):
+            name = file_path.stem[len("student_"):]
+            rows[name] = _analytics_row(StudentProfile.load(name))
+        _write_analytics_index(rows)
+        return rows
+
+    rows = {}
+    for line in lines:
+        try:
+            row = orjson.loads(line)
+        except ValueError:
+            # A torn final line from an interrupted append
+            continue
+        if row.get("deleted"):
+            rows.pop(row["name"], None)
+        else:
+            rows[row["name"]] = row
+    if len(lines) > 2 * len(rows) + 16:
+        _write_analytics_index(rows)
+    return rows
+
+
+def _write_analytics_index(rows: dict) -> None:
+    """Atomically replace the index with ``rows``; callers hold ``_analytics_lock``."""
+    _ensure_data_dir()
+    path = analytics_index_path()
+    _write_file(path, b"".join(orjson.dumps(row) + b"\n" for row in rows.values()))
+
+
 @dataclass
 class LearningSession:
     question_id: int
@@ -82,6 +346,93 @@ class LearningSession:
     hints_used: int
     timestamp: str
 
+def _write_file(path: Path, data: bytes) -> None:
+    """Replace ``path`` with ``data`` atomically, using raw, unbuffered writes.
+
+    The bytes go to a uniquely named sibling ``.tmp`` file that is then
+    renamed over ``path``, so a crash mid-write, a concurrent ``load`` or
+    another worker saving the same file never sees a truncated one. No
+    fsync: profiles are rewritten on every answer and losing the last one on
+    a power cut is acceptable.
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    try:
+        try:
+            os.fchmod(fd, 0o644)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def _derived(method):
+    """Read-only property cached until the next answer is recorded.
+
+    For the session-scanning scores that ``get_learning_insights`` and
+    ``engagement_level`` read several times per call.
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def getter(self):
+        key = (self.quizzes, len(self.learning_sessions))
+        cached = self._derived_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = method(self)
+        self._derived_cache[name] = (key, value)
+        return value
+
+    return property(getter)
+
+
+def _locked(method):
+    """Run a ``StudentProfile`` method under the profile's own lock.
+
+    ``save`` may run as a background task while the next request for the same
+    student records an answer; without the lock a session appended mid-save
+    could be counted as written.
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+def _read_sessions(path: Path, keep: int) -> tuple[List[dict], int, int | None]:
+    """Scan a JSON-lines session log.
+
+    Returns its last ``keep`` sessions, how many sessions it holds and its
+    size in bytes. The size is None when the log is missing or ends in a torn
+    line, so the next append knows to re-check it. Undecodable lines left by
+    interrupted writes are skipped.
+    """
+    tail: deque = deque(maxlen=keep)
+    count = size = 0
+    clean = True
+    try:
+        with path.open("rb") as fh:
+            for line in fh:
+                size += len(line)
+                clean = line.endswith(b"\n")
+                try:
+                    tail.append(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+                count += 1
+    except FileNotFoundError:
+        return [], 0, None
+    return list(tail), count, size if clean else None
+
+
 @dataclass
 class StudentProfile:
     name: str
@@ -102,6 +453,8 @@ class StudentProfile:
     session_frequency: float = 0.0  # sessions per day
     difficulty_progression: List[str] = None  # track difficulty changes
     topic_preferences: dict = None  # track which topics student engages with most
+    recent_correct_mask: int = 0  # bit 0 = most recent answer correct
+    preferred_topics: List[str] = None  # topics the student asked to focus on
     
     def __post_init__(self):
         if self.learning_sessions is None:
@@ -110,11 +463,34 @@ class StudentProfile:
             self.difficulty_progression = []
         if self.topic_preferences is None:
             self.topic_preferences = {}
+        if self.preferred_topics is None:
+            self.preferred_topics = []
+        # Sessions in ``sessions_path``, that file's expected size (None until
+        # known) and how many leading ``learning_sessions`` are already in it
+        self._sessions_saved = 0
+        self._sessions_size: int | None = None
+        self._saved_in_list = 0
+        # name -> ((quizzes, len(learning_sessions)), value) for @_derived
+        self._derived_cache: dict = {}
+        # Re-entrant: record_session saves while holding it
+        self._lock = threading.RLock()
 
     @property
     def accuracy(self) -> float:
         return self.correct / self.quizzes if self.quizzes else 0.0
 
+    def _recent_correct(self, count: int, skip: int = 0) -> int:
+        """Correct answers among ``count`` answers, ``skip`` back from the latest."""
+        # bin().count rather than int.bit_count to keep Python 3.8 support
+        return bin((self.recent_correct_mask >> skip) & ((1 << count) - 1)).count("1")
+
+    def recent_accuracy(self, window: int) -> float:
+        """Accuracy over the last ``window`` answers (at most RECENT_MASK_BITS)."""
+        count = min(len(self.learning_sessions), window)
+        if not count:
+            return self.accuracy
+        return self._recent_correct(count) / count
+
     @property
     def average_response_time(self) -> float:
         return self.total_response_time / self.quizzes if self.quizzes else 0.0
@@ -134,68 +510,71 @@ class StudentProfile:
         """How often student uses hints (0-1 scale)"""
         return self.total_hints_used / self.quizzes if self.quizzes else 0.0
 
-    @property
+    @_derived
     def recent_performance(self) -> float:
         """Performance in last 10 questions"""
         if len(self.learning_sessions) < 2:
             return self.accuracy
         
-        recent_sessions = self.learning_sessions[-10:] if len(self.learning_sessions) >= 10 else self.learning_sessions
-        recent_correct = sum(1 for session in recent_sessions if session.get('correct', False))
-        return recent_correct / len(recent_sessions) if recent_sessions else 0.0
+        return self.recent_accuracy(10)
 
-    @property
+    @_derived
     def consistency_score(self) -> float:
         """How consistent the student's performance is (lower variance = higher score)"""
         if len(self.learning_sessions) < 3:
             return 50.0  # neutral score for insufficient data
         
-        # Calculate variance in accuracy over recent sessions
-        recent_sessions = self.learning_sessions[-10:] if len(self.learning_sessions) >= 10 else self.learning_sessions
-        accuracies = [1.0 if session.get('correct', False) else 0.0 for session in recent_sessions]
-        
-        if not accuracies:
-            return 50.0
-            
-        mean_acc = sum(accuracies) / len(accuracies)
-        variance = sum((acc - mean_acc) ** 2 for acc in accuracies) / len(accuracies)
+        # Calculate variance in accuracy over recent sessions; each answer
+        # scores 1 or 0, so the variance is p * (1 - p)
+        mean_acc = self.recent_accuracy(10)
+        variance = mean_acc * (1 - mean_acc)
         
         # Convert variance to consistency score (0-100, higher is more consistent)
         consistency = max(0, 100 - (variance * 100))
         return consistency
 
-    @property
+    @_derived
     def learning_momentum(self) -> float:
         """Positive momentum if improving, negative if declining"""
         if len(self.learning_sessions) < 5:
             return 0.0
             
-        # Compare recent performance vs earlier performance
-        recent_sessions = self.learning_sessions[-5:]
-        earlier_sessions = self.learning_sessions[-10:-5] if len(self.learning_sessions) >= 10 else self.learning_sessions[:-5]
-        
-        if not earlier_sessions:
+        # Compare the last 5 answers with up to 5 before them
+        earlier = min(len(self.learning_sessions), 10) - 5
+        if not earlier:
             return 0.0
             
-        recent_perf = sum(1 for s in recent_sessions if s.get('correct', False)) / len(recent_sessions)
-        earlier_perf = sum(1 for s in earlier_sessions if s.get('correct', False)) / len(earlier_sessions)
+        recent_perf = self._recent_correct(5) / 5
+        earlier_perf = self._recent_correct(earlier, skip=5) / earlier
         
         return (recent_perf - earlier_perf) * 100  # -100 to +100 scale
 
     @property
     def engagement_level(self) -> str:
         """Enhanced engagement tracking with multiple sophisticated metrics"""
+        score, level = self._engagement
+        if score is not None:
+            # Update the stored engagement score
+            self.engagement_score = score
+        return level
+
+    @_derived
+    def _engagement(self) -> tuple[float | None, str]:
+        """``(engagement_score, engagement_level)``; no score before 2 answers."""
         if self.quizzes < 2:
-            return "learning"
+            return None, "learning"
+        
+        # The per-answer rates, divided once (quizzes >= 2 here)
+        quizzes = self.quizzes
         
         # Core performance metrics (40% weight)
-        accuracy_score = self.accuracy * 100
+        accuracy_score = self.correct / quizzes * 100
         recent_performance_score = self.recent_performance * 100
         
         # Behavioral engagement metrics (25% weight)
-        skip_penalty = self.skip_rate * 50  # High skip rate reduces engagement
-        hint_penalty = self.hint_dependency * 30  # Over-reliance on hints reduces engagement
-        hesitation_penalty = min(self.hesitation_score * 25, 30)  # Excessive hesitation reduces engagement
+        skip_penalty = self.total_skipped / quizzes * 50  # High skip rate reduces engagement
+        hint_penalty = self.total_hints_used / quizzes * 30  # Over-reliance on hints reduces engagement
+        hesitation_penalty = min(self.total_answer_changes / quizzes * 25, 30)  # Excessive hesitation reduces engagement
         
         behavioral_score = max(0, 100 - skip_penalty - hint_penalty - hesitation_penalty)
         
@@ -206,7 +585,7 @@ class StudentProfile:
         
         # Time efficiency metrics (15% weight)
         # Optimal response time is 15-45 seconds (not too fast, not too slow)
-        avg_time = self.average_response_time
+        avg_time = self.total_response_time / quizzes
         if avg_time < 15:
             time_score = 60 + (avg_time / 15) * 20  # 60-80 for very fast
         elif avg_time <= 45:
@@ -225,95 +604,152 @@ class StudentProfile:
         )
         
         # Apply learning curve adjustments
-        if self.quizzes < 10:
+        if quizzes < 10:
             # New learners get a boost to avoid discouragement
             engagement_score = min(100, engagement_score * 1.1)
-        elif self.quizzes > 50:
+        elif quizzes > 50:
             # Experienced learners need higher standards
             engagement_score = engagement_score * 0.95
         
-        # Update the stored engagement score
-        self.engagement_score = min(100, max(0, engagement_score))
+        engagement_score = min(100, max(0, engagement_score))
         
         # Determine engagement level with more nuanced thresholds
-        if self.engagement_score >= 85:
-            return "highly_engaged"
-        elif self.engagement_score >= 70:
-            return "engaged"
-        elif self.engagement_score >= 55:
-            return "moderate"
-        elif self.engagement_score >= 35:
-            return "struggling"
-        else:
-            return "disengaged"
+        return engagement_score, _ENGAGEMENT_LEVELS[bisect_right(_ENGAGEMENT_THRESHOLDS, engagement_score)]
 
     @property
     def learning_pace(self) -> str:
         """Determine learning pace based on response time"""
-        avg_time = self.average_response_time
-        if avg_time < 20:
-            return "fast"
-        elif avg_time < 60:
-            return "moderate"
-        else:
-            return "slow"
+        return _PACES[bisect_right(_PACE_THRESHOLDS, self.average_response_time)]
 
     @property
     def path(self) -> Path:
         return DATA_DIR / f"student_{self.name}.json"
 
+    @property
+    def sessions_path(self) -> Path:
+        """Append-only JSON-lines log of ``learning_sessions``."""
+        return DATA_DIR / f"student_{self.name}.jsonl"
+
+    @_locked
     def save(self) -> None:
-        DATA_DIR.mkdir(exist_ok=True)
-        with self.path.open("w", encoding="utf-8") as fh:
-            json.dump(asdict(self), fh, indent=2)
+        _ensure_data_dir()
+        self._save_sessions()
+        # The profile file holds everything but the sessions, so it stays small
+        header = {
+            key: value for key, value in self.__dict__.items()
+            if key != "learning_sessions" and not key.startswith("_")
+        }
+        header["learning_session_count"] = self._sessions_saved
+        path = self.path
+        _write_file(path, orjson.dumps(header, option=orjson.OPT_INDENT_2))
+        self._remember(path)
+        _append_analytics_rows([_analytics_row(self)])
+
+    def _save_sessions(self) -> None:
+        """Append new sessions to ``sessions_path`` and trim the in-memory list."""
+        sessions = self.learning_sessions
+        path = self.sessions_path
+        if self._sessions_saved == 0 and self._sessions_size is None:
+            # Nothing logged yet (new or legacy profile): write the whole history
+            body = b"".join(orjson.dumps(s) + b"\n" for s in sessions)
+            _write_file(path, body)
+            self._sessions_saved = len(sessions)
+            self._sessions_size = len(body)
+        else:
+            new = sessions[self._saved_in_list:]
+            if new:
+                chunk = b"".join(orjson.dumps(s) + b"\n" for s in new)
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    size = 0
+                if size != self._sessions_size:
+                    # Another writer (or an interrupted one) changed the log;
+                    # count what it holds now and append after it
+                    _, self._sessions_saved, clean_size = _read_sessions(path, 0)
+                    if clean_size is None and size:
+                        chunk = b"\n" + chunk
+                with path.open("ab") as fh:
+                    fh.write(chunk)
+                self._sessions_saved += len(new)
+                self._sessions_size = size + len(chunk)
+        # Only the recent sessions are needed in memory; the log keeps the rest
+        del sessions[:-SESSION_WINDOW]
+        self._saved_in_list = len(sessions)
+
+    def _remember(self, path: Path, st: os.stat_result | None = None) -> None:
+        """Cache this instance as the current contents of ``path``."""
+        st = st or path.stat()
+        key = str(path)
+        _profile_cache[key] = ((st.st_mtime_ns, st.st_size), self)
+        _profile_cache.move_to_end(key)
+        if len(_profile_cache) > PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
 
     @classmethod
     def load(cls, name: str) -> "StudentProfile":
-        DATA_DIR.mkdir(exist_ok=True)
         path = DATA_DIR / f"student_{name}.json"
-        if path.exists():
-            with path.open("r", encoding="utf-8") as fh:
-                data = json.load(fh)
-            # Handle backward compatibility
-            if "learning_sessions" not in data:
-                data["learning_sessions"] = []
-            if "learning_style" not in data:
-                data["learning_style"] = "unknown"
-            if "preferred_difficulty" not in data:
-                data["preferred_difficulty"] = "medium"
-            if "quiz_sessions" not in data:
-                # For existing students, start with 1 quiz session
-                data["quiz_sessions"] = 1
-            if "engagement_score" not in data:
-                data["engagement_score"] = 0.0
-            if "last_activity" not in data:
-                data["last_activity"] = ""
-            return cls(**data)
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            _profile_cache.pop(str(path), None)
+            st = None
+        if st is not None:
+            cached = _profile_cache.get(str(path))
+            if cached is not None and cached[0] == (st.st_mtime_ns, st.st_size):
+                _profile_cache.move_to_end(str(path))
+                return cached[1]
+            data = orjson.loads(path.read_bytes())
+            logged = data.pop("learning_session_count", None) is not None
+            if logged:
+                data["learning_sessions"], session_count, sessions_size = _read_sessions(
+                    DATA_DIR / f"student_{name}.jsonl", SESSION_WINDOW
+                )
+            # Fill fields older files lack and drop ones this version doesn't know
+            data = {**_LOAD_DEFAULTS, **{k: v for k, v in data.items() if k in _PROFILE_FIELDS}}
+            if "recent_correct_mask" not in data:
+                mask = 0
+                for s in (data.get("learning_sessions") or ())[-RECENT_MASK_BITS:]:
+                    mask = (mask << 1) | bool(s.get("correct", False))
+                data["recent_correct_mask"] = mask
+            profile = cls(**data)
+            if logged:
+                profile._sessions_saved = session_count
+                profile._sessions_size = sessions_size
+                profile._saved_in_list = len(profile.learning_sessions)
+            profile._remember(path, st)
+            return profile
         return cls(name=name)
 
+    @_locked
     def record_session(self, question_id: int, difficulty: str, answer: str, 
                       correct: bool, response_time: float, answer_changes: int = 0, 
-                      hints_used: int = 0, topic: str = "general", skipped: bool = False) -> None:
-        """Record a complete learning session with detailed metrics and enhanced engagement tracking"""
-        from datetime import datetime
-        
-        session = LearningSession(
-            question_id=question_id,
-            difficulty=difficulty,
-            answer=answer,
-            correct=correct,
-            response_time=response_time,
-            answer_changes=answer_changes,
-            hints_used=hints_used,
-            timestamp=datetime.now().isoformat()
-        )
-        
-        # Add enhanced session data
-        session_data = asdict(session)
-        session_data.update({
+                      hints_used: int = 0, topic: str = "general", skipped: bool = False,
+                      save: bool = True) -> None:
+        """Record a complete learning session with detailed metrics and enhanced engagement tracking
+
+        Pass ``save=False`` to persist later (e.g. from a background task).
+        A profile with no file yet is still saved straight away, since until
+        then ``load`` would hand out a fresh profile.
+        """
+        # Few distinct values, repeated in every session and in topic_preferences
+        difficulty = sys.intern(difficulty)
+        topic = sys.intern(topic)
+        now = datetime.now().isoformat()
+        # Same keys as LearningSession plus topic/skipped, built directly
+        # rather than through a dataclass and asdict()
+        session_data = {
+            "question_id": question_id,
+            "difficulty": difficulty,
+            "answer": answer,
+            "correct": correct,
+            "response_time": response_time,
+            "answer_changes": answer_changes,
+            "hints_used": hints_used,
+            "timestamp": now,
             "topic": topic,
-            "skipped": skipped
-        })
+            "skipped": skipped,
+        }
         
         self.learning_sessions.append(session_data)
         self.quizzes += 1
@@ -323,20 +759,21 @@ class StudentProfile:
         
         if correct:
             self.correct += 1
+        self.recent_correct_mask = (
+            (self.recent_correct_mask << 1) | bool(correct)
+        ) & ((1 << RECENT_MASK_BITS) - 1)
         if skipped:
             self.total_skipped += 1
             
-        # Update topic preferences
-        if topic not in self.topic_preferences:
-            self.topic_preferences[topic] = {"total": 0, "correct": 0, "avg_time": 0}
+        # Update topic preferences (running mean of the response time)
+        stats = self.topic_preferences.get(topic)
+        if stats is None:
+            stats = self.topic_preferences[topic] = {"total": 0, "correct": 0, "avg_time": 0}
         
-        self.topic_preferences[topic]["total"] += 1
+        stats["total"] += 1
         if correct:
-            self.topic_preferences[topic]["correct"] += 1
-        self.topic_preferences[topic]["avg_time"] = (
-            (self.topic_preferences[topic]["avg_time"] * (self.topic_preferences[topic]["total"] - 1) + response_time) 
-            / self.topic_preferences[topic]["total"]
-        )
+            stats["correct"] += 1
+        stats["avg_time"] += (response_time - stats["avg_time"]) / stats["total"]
         
         # Update difficulty progression
         self.difficulty_progression.append(difficulty)
@@ -350,12 +787,13 @@ class StudentProfile:
         self._update_improvement_trend()
         self._update_engagement_score()
         
-        self.last_activity = datetime.now().isoformat()
-        self.save()
+        self.last_activity = now
+        if save or not self.path.exists():
+            self.save()
 
+    @_locked
     def end_quiz_session(self) -> None:
         """End a quiz session - call this when a student clicks 'End Quiz'"""
-        from datetime import datetime
         self.quiz_sessions += 1
         self.last_activity = datetime.now().isoformat()
         self.save()
@@ -367,15 +805,8 @@ class StudentProfile:
             return
             
         # Compare last 5 sessions vs previous 5 sessions
-        recent_sessions = self.learning_sessions[-5:]
-        previous_sessions = self.learning_sessions[-10:-5] if len(self.learning_sessions) >= 10 else self.learning_sessions[:-5]
-        
-        if not previous_sessions:
-            self.improvement_trend = 0.0
-            return
-            
-        recent_accuracy = sum(1 for s in recent_sessions if s.get('correct', False)) / len(recent_sessions)
-        previous_accuracy = sum(1 for s in previous_sessions if s.get('correct', False)) / len(previous_sessions)
+        recent_accuracy = self._recent_correct(5) / 5
+        previous_accuracy = self._recent_correct(5, skip=5) / 5
         
         self.improvement_trend = (recent_accuracy - previous_accuracy) * 100
 
@@ -406,12 +837,16 @@ class StudentProfile:
         
         if not recent_sessions:
             return scores
+        
+        # Profile-wide rates, read once rather than per check/session
+        accuracy = self.accuracy
+        avg_time = self.average_response_time
             
         # 1. VISUAL LEARNER INDICATORS
         # - Fast response to visual/spatial questions (geometry, patterns)
         # - High accuracy on visual problems
         # - Low hesitation on visual tasks
-        visual_questions = [s for s in recent_sessions if s.get('topic') in ['geometry', 'colors', 'patterns']]
+        visual_questions = [s for s in recent_sessions if s.get('topic') in _VISUAL_TOPICS]
         if visual_questions:
             visual_accuracy = sum(1 for s in visual_questions if s['correct']) / len(visual_questions)
             visual_avg_time = sum(s['response_time'] for s in visual_questions) / len(visual_questions)
@@ -426,18 +861,18 @@ class StudentProfile:
         # - Consistent performance across all question types
         # - Moderate response time (not too fast, not too slow)
         # - Good performance on word-based problems
-        word_questions = [s for s in recent_sessions if s.get('topic') in ['geography', 'language', 'word_problems']]
+        word_questions = [s for s in recent_sessions if s.get('topic') in _WORD_TOPICS]
         if word_questions:
             word_accuracy = sum(1 for s in word_questions if s['correct']) / len(word_questions)
             scores['auditory'] += word_accuracy * 0.5
         else:
             # If no specific word questions, use overall consistency
-            scores['auditory'] += self.accuracy * 0.3
+            scores['auditory'] += accuracy * 0.3
             
         # Consistency factor (auditory learners are consistent)
         response_times = [s['response_time'] for s in recent_sessions]
         if len(response_times) > 1:
-            time_variance = sum((t - self.average_response_time) ** 2 for t in response_times) / len(response_times)
+            time_variance = sum((t - avg_time) ** 2 for t in response_times) / len(response_times)
             consistency_score = max(0, 1 - (time_variance / 1000))  # Normalize variance
             scores['auditory'] += consistency_score * 0.4
         
@@ -463,11 +898,11 @@ class StudentProfile:
         # - Slower, more methodical approach
         # - High accuracy despite slower pace
         # - Better on theoretical/conceptual questions
-        if self.average_response_time > 45:  # Slower approach
+        if avg_time > 45:  # Slower approach
             scores['reading'] += 0.3
             
-        if self.accuracy > 0.6:  # High accuracy
-            scores['reading'] += self.accuracy * 0.4
+        if accuracy > 0.6:  # High accuracy
+            scores['reading'] += accuracy * 0.4
             
         # Methodical approach (low skip rate, high completion)
         skip_rate = self.skip_rate
@@ -475,11 +910,11 @@ class StudentProfile:
         
         # 5. ADJUSTMENTS BASED ON OVERALL PATTERNS
         # Fast responders with high accuracy might be visual
-        if self.average_response_time < 25 and self.accuracy > 0.7:
+        if avg_time < 25 and accuracy > 0.7:
             scores['visual'] += 0.2
             
         # Slow responders with high accuracy might be reading
-        if self.average_response_time > 60 and self.accuracy > 0.6:
+        if avg_time > 60 and accuracy > 0.6:
             scores['reading'] += 0.2
             
         # High hint users might be kinesthetic
@@ -488,7 +923,8 @@ class StudentProfile:
             
         # Very consistent performers might be auditory
         if len(response_times) > 5:
-            time_consistency = 1 - (max(response_times) - min(response_times)) / max(response_times)
+            slowest = max(response_times)
+            time_consistency = 1 - (slowest - min(response_times)) / slowest
             if time_consistency > 0.7:
                 scores['auditory'] += 0.2
         
@@ -501,9 +937,10 @@ class StudentProfile:
             return
             
         # Factors: accuracy, response time, consistency
-        accuracy_factor = self.accuracy
-        time_factor = max(0, 1 - (self.average_response_time / 120))  # Normalize to 2 minutes
-        consistency_factor = 1 - (self.hesitation_score / 3)  # Less hesitation = more consistent
+        quizzes = self.quizzes
+        accuracy_factor = self.correct / quizzes
+        time_factor = max(0, 1 - (self.total_response_time / quizzes / 120))  # Normalize to 2 minutes
+        consistency_factor = 1 - (self.total_answer_changes / quizzes / 3)  # Less hesitation = more consistent
         
         self.engagement_score = (accuracy_factor * 0.5 + time_factor * 0.3 + consistency_factor * 0.2)
 
@@ -589,18 +1026,21 @@ class StudentProfile:
 
     def get_learning_insights(self) -> dict:
         """Generate comprehensive insights for teachers/educators with enhanced engagement tracking"""
+        # engagement_level also refreshes engagement_score, so read it first
+        accuracy = self.accuracy
+        engagement_level = self.engagement_level
         return {
             "student_name": self.name,
             "total_quizzes": self.quizzes,
-            "accuracy": round(self.accuracy * 100, 1),
+            "accuracy": round(accuracy * 100, 1),
             "learning_style": self.learning_style,
-            "engagement_level": self.engagement_level,
+            "engagement_level": engagement_level,
             "learning_pace": self.learning_pace,
             "average_response_time": round(self.average_response_time, 1),
             "hesitation_score": round(self.hesitation_score, 2),
             "engagement_score": round(self.engagement_score, 2),
             "last_activity": self.last_activity,
-            "needs_attention": self.engagement_level in ["struggling", "moderate"] and self.accuracy < 0.5,
+            "needs_attention": engagement_level in ("struggling", "moderate") and accuracy < 0.5,
             # Enhanced engagement metrics
             "skip_rate": round(self.skip_rate * 100, 1),
             "hint_dependency": round(self.hint_dependency * 100, 1),
@@ -662,8 +1102,15 @@ class StudentProfile:
         
         # Topic-specific recommendations
         if self.topic_preferences:
-            best_topic = max(self.topic_preferences.items(), key=lambda x: x[1]["correct"] / x[1]["total"] if x[1]["total"] > 0 else 0)
-            worst_topic = min(self.topic_preferences.items(), key=lambda x: x[1]["correct"] / x[1]["total"] if x[1]["total"] > 0 else 0)
+            # One pass for both ends; ties keep the first topic, as max/min do
+            best_topic = worst_topic = None
+            for item in self.topic_preferences.items():
+                stats = item[1]
+                ratio = stats["correct"] / stats["total"] if stats["total"] > 0 else 0
+                if best_topic is None or ratio > best_ratio:
+                    best_topic, best_ratio = item, ratio
+                if worst_topic is None or ratio < worst_ratio:
+                    worst_topic, worst_ratio = item, ratio
             
             if best_topic[1]["total"] > 3:
                 insights["recommendations"].append(f"Strong performance in {best_topic[0]} - use as confidence builder")
@@ -677,6 +1124,14 @@ class StudentProfile:
         self.record_session(0, "unknown", "", correct, 0.0)
 
 
+_PROFILE_FIELDS = frozenset(f.name for f in fields(StudentProfile))
+
+# Values StudentProfile.load gives fields missing from older profile files
+# where they differ from the dataclass defaults. Existing students count as
+# having had one quiz session.
+_LOAD_DEFAULTS = {"quiz_sessions": 1}
+
+
 if __name__ == "__main__":  # pragma: no cover
     # small manual test when executed directly
     print(call_llm([{"role": "user", "content": "Hello"}]))
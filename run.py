@@ -0,0 +1,36 @@
+"""Production entry point for the ThinkBot API.
+
+Runs ``api:app`` under uvicorn with several worker processes. uvicorn picks
+uvloop and httptools automatically when they are installed (they come with
+``uvicorn[standard]``).
+
+Configuration comes from the environment:
+
+- ``HOST`` / ``PORT``: bind address (default ``0.0.0.0:8001``)
+- ``WEB_CONCURRENCY``: worker processes (default ``2 * CPUs + 1``)
+- ``LIMIT_CONCURRENCY``: open connections per worker before new ones get a
+  503 (default 512)
+"""
+
+from __future__ import annotations
+
+import os
+
+import uvicorn
+
+
+def main() -> None:
+    workers = int(os.getenv("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+    uvicorn.run(
+        "api:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8001")),
+        workers=workers,
+        loop="auto",
+        http="auto",
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "512")),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import asyncio
+import json
+import os
+from functools import lru_cache
+
 import api
 from fastapi.testclient import TestClient
 
 
+class FirstChoice:
+    def choice(self, seq):
+        return seq[0]
+
+
 def setup_stub(monkeypatch, accuracy=0.0):
     class StubProfile:
         def __init__(self, name="test"):
@@ -13,14 +23,20 @@ def setup_stub(monkeypatch, accuracy=0.0):
             self.learning_style = "unknown"
             self.learning_pace = "moderate"
 
+        def recent_accuracy(self, window):
+            return self.accuracy
+
         def record(self, correct):
             self.records.append(correct)
             if self.records:
                 self.accuracy = sum(self.records) / len(self.records)
 
-        def record_session(self, question_id, difficulty, answer, correct, response_time, answer_changes=0, hints_used=0):
+        def record_session(self, question_id, difficulty, answer, correct, response_time, answer_changes=0, hints_used=0, save=True):
             self.record(correct)
 
+        def save(self):
+            pass
+
         def get_learning_insights(self):
             return {
                 "student_name": "test",
@@ -41,12 +57,13 @@ def setup_stub(monkeypatch, accuracy=0.0):
             return cls(name)
 
     monkeypatch.setattr(api, "StudentProfile", StubProfile)
+    api._feedback_cache.clear()
     return StubProfile
 
 
 def test_get_question_respects_accuracy(monkeypatch):
     setup_stub(monkeypatch, accuracy=0.2)
-    monkeypatch.setattr(api.random, "choice", lambda seq: seq[0])
+    monkeypatch.setattr(api, "_rng", lambda: FirstChoice())
     client = TestClient(api.app)
     res = client.get("/question", params={"student": "Alice"})
     assert res.status_code == 200
@@ -55,10 +72,47 @@ def test_get_question_respects_accuracy(monkeypatch):
     assert data["id"] == api.QUESTIONS["easy"][0]["id"]
 
 
+def test_get_question_filters_by_topic(monkeypatch):
+    setup_stub(monkeypatch, accuracy=0.2)
+    monkeypatch.setattr(api, "_rng", lambda: FirstChoice())
+    client = TestClient(api.app)
+    res = client.get("/question", params={"student": "Alice", "topic": "geography"})
+    assert res.status_code == 200
+    data = res.json()
+    assert data["topic"] == "geography"
+    assert data["id"] == api.QUESTIONS_BY_TOPIC[data["difficulty"]]["geography"][0]["id"]
+
+
+def test_get_question_refills_low_bucket_in_background(monkeypatch):
+    setup_stub(monkeypatch, accuracy=0.2)
+    monkeypatch.setattr(api, "_rng", lambda: FirstChoice())
+    level, topic = "easy", "trivia"
+    monkeypatch.setattr(api, "QUESTIONS_BY_TOPIC", {level: {topic: api.QUESTIONS[level][:2]}})
+    refills = []
+
+    async def fake_generate(topic, level, count=10):
+        refills.append((topic, level))
+        return True
+
+    monkeypatch.setattr(api, "generate_new_questions_auto", fake_generate)
+    client = TestClient(api.app)
+    res = client.get("/question", params={"student": "Alice", "topic": topic})
+    assert res.status_code == 200
+    assert res.json()["id"] == api.QUESTIONS[level][0]["id"]
+    assert refills == [(topic, level)]
+    assert not api._refills_in_flight
+
+
 def test_submit_answer_updates_accuracy(monkeypatch):
     setup_stub(monkeypatch, accuracy=0.0)
     captured = {}
-    monkeypatch.setattr(api, "call_llm", lambda messages: captured.setdefault("msg", messages) or "Good job")
+
+    async def fake_call_llm(messages, system_instruction=None):
+        captured["msg"] = messages
+        captured["system"] = system_instruction
+        return "Good job"
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
     client = TestClient(api.app)
     q = api.QUESTIONS["easy"][0]
     res = client.post(
@@ -70,6 +124,99 @@ def test_submit_answer_updates_accuracy(monkeypatch):
     assert data["correct"] is True
     assert data["accuracy"] == 1.0
     assert "Student Profile:" in captured["msg"][0]["content"]
+    assert captured["system"] == api.FEEDBACK_SYSTEM_PROMPT
+
+
+def test_repeated_answer_reuses_cached_feedback(monkeypatch):
+    setup_stub(monkeypatch)
+    calls = []
+
+    async def fake_call_llm(messages, system_instruction=None):
+        calls.append(messages)
+        return "Try again"
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
+    client = TestClient(api.app)
+    q = api.QUESTIONS["easy"][0]
+    body = {"student": "Cara", "question_id": q["id"], "answer": "not it"}
+    first = client.post("/answer", json=body).json()
+    second = client.post("/answer", json={**body, "answer": "It  NOT"}).json()
+    assert first["feedback"] == second["feedback"] == "Try again"
+    assert len(calls) == 1
+
+
+def test_concurrent_feedback_is_batched(monkeypatch):
+    calls = []
+
+    async def fake_call_llm(messages, system_instruction=None):
+        calls.append(messages)
+        return '{"1": "First", "2": "Second"}'
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
+
+    async def run():
+        await api.start_feedback_batcher()
+        try:
+            return await asyncio.gather(
+                api._request_feedback("prompt one"), api._request_feedback("prompt two")
+            )
+        finally:
+            await api.stop_feedback_batcher()
+
+    assert asyncio.run(run()) == ["First", "Second"]
+    assert len(calls) == 1
+
+
+
+def test_stopping_the_batcher_answers_pending_feedback(monkeypatch):
+    started = []
+
+    async def hanging_call_llm(messages, system_instruction=None):
+        started.append(messages)
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(api, "call_llm_async", hanging_call_llm)
+    monkeypatch.setattr(api, "FEEDBACK_BATCH_SIZE", 1)
+
+    async def run():
+        await api.start_feedback_batcher()
+        in_flight = asyncio.ensure_future(api._request_feedback("dispatched"))
+        while not started:
+            await asyncio.sleep(0)
+        queued = asyncio.ensure_future(api._request_feedback("queued"))
+        await asyncio.sleep(0)
+        await api.stop_feedback_batcher()
+        return await asyncio.wait_for(asyncio.gather(in_flight, queued), 1)
+
+    assert asyncio.run(run()) == [api.FEEDBACK_SHUTDOWN_REPLY] * 2
+
+def test_get_hint_returns_prebuilt_payload():
+    client = TestClient(api.app)
+    q = api.QUESTIONS["easy"][0]
+    res = client.get(f"/hint/{q['id']}")
+    assert res.status_code == 200
+    assert res.json() == {"question_id": q["id"], "hint": q["hint"], "topic": q["topic"]}
+    assert client.get("/hint/999999").status_code == 404
+
+
+def test_get_hint_and_student_analytics_honour_etag(tmp_path, monkeypatch):
+    monkeypatch.setattr(api.main, "DATA_DIR", tmp_path)
+    client = TestClient(api.app)
+    q = api.QUESTIONS["easy"][0]
+    etag = client.get(f"/hint/{q['id']}").headers["etag"]
+    assert client.get(f"/hint/{q['id']}", headers={"If-None-Match": etag}).status_code == 304
+    # A worker that loaded the bank at a different time tags the hint the same
+    monkeypatch.setattr(api, "_questions_mtime", api._questions_mtime + 1)
+    assert client.get(f"/hint/{q['id']}", headers={"If-None-Match": etag}).status_code == 304
+
+    api.StudentProfile(name="Finn").save()
+    etag = client.get("/analytics/Finn").headers["etag"]
+    assert client.get("/analytics/Finn", headers={"If-None-Match": etag}).status_code == 304
+    profile = api.StudentProfile.load("Finn")
+    profile.record_session(q["id"], "easy", q["answer"], True, 5.0)
+    res = client.get("/analytics/Finn", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.json()["total_quizzes"] == 1
 
 
 def test_root_serves_html():
@@ -78,3 +225,146 @@ def test_root_serves_html():
     assert res.status_code == 200
     assert "<!DOCTYPE html>" in res.text
 
+
+
+def test_all_analytics_reads_the_index(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(api, "_analytics_cache", None)
+    api.StudentProfile(name="Dana").save()
+    loads = []
+    real_load = api.StudentProfile.load
+
+    def counting_load(name):
+        loads.append(name)
+        return real_load(name)
+
+    monkeypatch.setattr(api.StudentProfile, "load", counting_load)
+    client = TestClient(api.app)
+    assert client.get("/analytics").json()["total_students"] == 1
+    api.StudentProfile(name="Eli").save()
+    assert client.get("/analytics").json()["total_students"] == 2
+    client.delete("/clear-student/Dana")
+    body = client.get("/analytics").json()
+    assert [s["name"] for s in body["students"]] == ["Eli"]
+    assert loads == []
+
+
+def test_root_honours_etag():
+    client = TestClient(api.app)
+    etag = client.get("/").headers["etag"]
+    res = client.get("/", headers={"If-None-Match": etag})
+    assert res.status_code == 304
+
+
+def test_root_reloads_page_when_file_changes(tmp_path, monkeypatch):
+    page = tmp_path / "index.html"
+    page.write_text("<p>one</p>")
+    monkeypatch.setattr(api, "INDEX_FILE", page)
+    client = TestClient(api.app)
+    first = client.get("/")
+    assert first.text == "<p>one</p>"
+    page.write_text("<p>two</p>")
+    os.utime(page, ns=(page.stat().st_atime_ns, page.stat().st_mtime_ns + 1))
+    second = client.get("/")
+    assert second.text == "<p>two</p>"
+    assert second.headers["etag"] != first.headers["etag"]
+
+
+def _isolate_question_bank(monkeypatch, tmp_path):
+    for name in ("QUESTION_INDEX", "QUESTIONS_BY_TOPIC", "_QUESTION_VIEWS", "_HINT_RESPONSES",
+                 "_question_ids", "_questions_mtime"):
+        monkeypatch.setattr(api, name, getattr(api, name))
+    monkeypatch.setattr(api, "QUESTIONS", dict(api.QUESTIONS))
+    monkeypatch.setattr(api, "QUESTIONS_LOCK_FILE", tmp_path / "questions.json.lock")
+
+
+def test_generate_questions_awaits_llm_and_saves(tmp_path, monkeypatch):
+    _isolate_question_bank(monkeypatch, tmp_path)
+    saved = []
+    monkeypatch.setattr(api, "_write_questions", lambda: saved.append(True))
+
+    async def fake_call_llm(messages, system_instruction=None):
+        assert messages[0]["role"] == "user"
+        return '[{"question": "2 + 2?", "answer": "4", "topic": "arithmetic", "difficulty": "easy"}]'
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
+    client = TestClient(api.app)
+    res = client.post("/generate-questions", params={"topic": "arithmetic", "count": 1})
+    assert res.status_code == 200
+    generated = res.json()["questions"][0]
+    assert not set(generated) & {"answer_norm", "answer_numeric"}
+    assert api.QUESTION_INDEX[generated["id"]]["answer"] == "4"
+    assert saved == [True]
+
+
+def test_add_questions_keeps_batches_saved_by_other_workers(tmp_path, monkeypatch):
+    _isolate_question_bank(monkeypatch, tmp_path)
+    bank = {level: [dict(q) for q in qs] for level, qs in api._questions_for_disk().items()}
+    other = {"id": max(api.QUESTION_INDEX) + 1, "question": "Other worker?", "answer": "yes", "topic": "t"}
+    bank["easy"].append(other)
+    questions_file = tmp_path / "questions.json"
+    questions_file.write_text(json.dumps(bank))
+    monkeypatch.setattr(api, "QUESTIONS_FILE", questions_file)
+
+    added = api._add_questions("easy", [{"question": "Mine?", "answer": "no", "topic": "t"}])
+    assert added[0]["id"] == other["id"] + 1
+    saved = json.loads(questions_file.read_text())["easy"]
+    assert [q["question"] for q in saved[-2:]] == ["Other worker?", "Mine?"]
+
+
+def test_questions_saved_by_another_worker_are_served(tmp_path, monkeypatch):
+    _isolate_question_bank(monkeypatch, tmp_path)
+    setup_stub(monkeypatch)
+
+    async def fake_call_llm(messages, system_instruction=None):
+        return "Nice"
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
+    questions_file = tmp_path / "questions.json"
+    bank = api._questions_for_disk()
+    questions_file.write_text(json.dumps(bank))
+    monkeypatch.setattr(api, "QUESTIONS_FILE", questions_file)
+    monkeypatch.setattr(api, "_questions_mtime", questions_file.stat().st_mtime_ns)
+
+    # Another process appends a question and rewrites the file
+    new_id = max(api.QUESTION_INDEX) + 1
+    bank["easy"].append({"id": new_id, "question": "Elsewhere?", "answer": "yes",
+                         "topic": "t", "hint": "Say yes"})
+    questions_file.write_text(json.dumps(bank))
+    st = questions_file.stat()
+    os.utime(questions_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    client = TestClient(api.app)
+    assert client.get(f"/hint/{new_id}").json()["hint"] == "Say yes"
+    res = client.post("/answer", json={"student": "Gus", "question_id": new_id, "answer": "yes"})
+    assert res.status_code == 200
+    assert res.json()["correct"] is True
+
+def test_superscript_answers_use_numeric_matching(monkeypatch):
+    setup_stub(monkeypatch)
+
+    async def fake_call_llm(messages, system_instruction=None):
+        return "Keep going"
+
+    monkeypatch.setattr(api, "call_llm_async", fake_call_llm)
+    client = TestClient(api.app)
+    q = api.QUESTION_INDEX[31]
+    assert q["answer"] == "a² + b² = c²"
+    for partial in ("a²", "c²"):
+        res = client.post("/answer", json={"student": "Ivy", "question_id": 31, "answer": partial})
+        assert res.json()["correct"] is False
+    res = client.post("/answer", json={"student": "Ivy", "question_id": 31, "answer": "A² + B² = C²"})
+    assert res.json()["correct"] is True
+
+
+def test_variation_index_accepts_either_direction():
+    assert "usa" in api._VARIATION_INDEX["united states"]
+    assert "united states" in api._VARIATION_INDEX["usa"]
+    assert "atlantic" not in api._VARIATION_INDEX.get("pacific", ())
+
+
+def test_long_answers_bypass_the_comparison_cache(monkeypatch):
+    monkeypatch.setattr(api, "_compare_normalized_cached", lru_cache(maxsize=8)(api._compare_normalized))
+    assert api.is_mathematically_equivalent("0.5", "1/2")
+    assert api.is_mathematically_equivalent("1" * 65, "1" * 65 + ".0")
+    assert api._compare_normalized_cached.cache_info().currsize == 1
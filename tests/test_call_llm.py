@@ -1,31 +1,98 @@
+import asyncio
+
+import httpx
+import orjson
+
 import main
 
 
 def test_call_llm(monkeypatch):
     captured = {}
 
-    def fake_post(url, params=None, json=None, timeout=None):
-        captured.update({"url": url, "params": params, "json": json})
+    def fake_post(url, data=None, headers=None, timeout=None):
+        captured.update({"url": url, "headers": headers, "json": orjson.loads(data)})
 
         class Resp:
+            content = b'{"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}'
+
             def raise_for_status(self):
                 pass
 
-            def json(self):
-                return {"candidates": [{"content": {"parts": [{"text": "Hello"}]}}]}
-
         return Resp()
 
     monkeypatch.setattr(main, "GEMINI_API_KEY", "test-key")
-    monkeypatch.setattr(main.requests, "post", fake_post)
+    monkeypatch.setattr(main._get_session(), "post", fake_post)
 
     result = main.call_llm([{"role": "user", "content": "hi"}])
     assert result == "Hello"
+    assert captured["headers"]["x-goog-api-key"] == "test-key"
+    assert captured["headers"]["Content-Type"] == "application/json"
+    assert "key=" not in captured["url"]
     assert "thinkingBudget" in captured["json"]["generationConfig"]["thinkingConfig"]
     assert captured["json"]["contents"][0]["role"] == "user"
+    assert "systemInstruction" not in captured["json"]
+
+
+def test_call_llm_sends_system_instruction(monkeypatch):
+    captured = {}
+
+    def fake_post(url, data=None, headers=None, timeout=None):
+        captured["json"] = orjson.loads(data)
+
+        class Resp:
+            content = b"{}"
+
+            def raise_for_status(self):
+                pass
+
+        return Resp()
+
+    monkeypatch.setattr(main, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(main._get_session(), "post", fake_post)
+
+    main.call_llm([{"role": "user", "content": "hi"}], system_instruction="Be kind")
+    assert captured["json"]["systemInstruction"] == {"parts": [{"text": "Be kind"}]}
 
 
 def test_call_llm_without_key(monkeypatch):
     monkeypatch.setattr(main, "GEMINI_API_KEY", "")
     result = main.call_llm([{"role": "user", "content": "hi"}])
     assert "key" in result.lower()
+
+
+def test_call_llm_hides_key_in_errors(monkeypatch):
+    def fake_post(url, data=None, headers=None, timeout=None):
+        raise RuntimeError(f"Invalid API key {headers['x-goog-api-key']} for {url}")
+
+    monkeypatch.setattr(main, "GEMINI_API_KEY", "secret-key")
+    monkeypatch.setattr(main._get_session(), "post", fake_post)
+
+    result = main.call_llm([{"role": "user", "content": "hi"}])
+    assert "secret-key" not in result
+    assert "Invalid API key ***HIDDEN*** for" in result
+
+
+def test_call_llm_async_uses_shared_client(monkeypatch):
+    captured = {}
+
+    def handler(request):
+        captured["url"] = str(request.url)
+        captured["key"] = request.headers["x-goog-api-key"]
+        captured["json"] = orjson.loads(request.content)
+        return httpx.Response(
+            200, json={"candidates": [{"content": {"parts": [{"text": "Hi async"}]}}]}
+        )
+
+    async def run():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(main, "_async_client", client)
+        try:
+            return await main.call_llm_async([{"role": "user", "content": "hi"}])
+        finally:
+            await client.aclose()
+
+    monkeypatch.setattr(main, "GEMINI_API_KEY", "test-key")
+    assert asyncio.run(run()) == "Hi async"
+    assert "generateContent" in captured["url"]
+    assert captured["json"]["contents"][0]["parts"] == [{"text": "hi"}]
+    assert captured["key"] == "test-key"
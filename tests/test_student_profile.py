@@ -1,4 +1,6 @@
 import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import main
@@ -23,3 +25,205 @@ def test_record_and_accuracy(tmp_path, monkeypatch):
     data = json.loads((tmp_path / "student_Alice.json").read_text())
     assert data["correct"] == 1
     assert data["quizzes"] == 2
+
+
+def test_recent_accuracy_tracks_latest_answers(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+
+    profile = main.StudentProfile.load("Bea")
+    for correct in [False, False, True, True, True]:
+        profile.record(correct)
+    assert profile.recent_accuracy(3) == 1.0
+    assert profile.recent_accuracy(5) == 0.6
+
+    # Profiles saved without the mask rebuild it from their sessions
+    data = json.loads(profile.path.read_text())
+    del data["recent_correct_mask"]
+    profile.path.write_text(json.dumps(data))
+    assert main.StudentProfile.load("Bea").recent_correct_mask == profile.recent_correct_mask
+
+
+def test_load_reuses_cached_profile_until_file_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+
+    profile = main.StudentProfile.load("Cal")
+    profile.record(True)
+    assert main.StudentProfile.load("Cal") is profile
+
+    # A write from elsewhere (e.g. another worker) invalidates the cached copy
+    data = json.loads(profile.path.read_text())
+    data["quizzes"] = 5
+    profile.path.write_text(json.dumps(data))
+    reloaded = main.StudentProfile.load("Cal")
+    assert reloaded is not profile
+    assert reloaded.quizzes == 5
+
+
+def test_analytics_index_is_seeded_from_existing_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    main.StudentProfile(name="Ann").save()
+    main.StudentProfile(name="Ben").save()
+    main.analytics_index_path().unlink()
+    assert sorted(main.load_analytics_index()) == ["Ann", "Ben"]
+    for _ in range(40):
+        main.StudentProfile(name="Ann").save()
+    assert sorted(main.load_analytics_index()) == ["Ann", "Ben"]
+    assert len(main.analytics_index_path().read_text().splitlines()) == 2
+
+
+
+
+def test_saves_compact_the_analytics_index_without_reads(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "ANALYTICS_COMPACT_EVERY", 20)
+    profile = main.StudentProfile(name="Ann")
+    for _ in range(100):
+        profile.save()
+    assert len(main.analytics_index_path().read_text().splitlines()) <= 20
+
+def test_concurrent_saves_keep_analytics_index_whole(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    names = [f"S{i}" for i in range(8)]
+
+    def save_and_read(name):
+        for _ in range(10):
+            main.StudentProfile(name=name).save()
+            main.load_analytics_index()
+
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        list(pool.map(save_and_read, names))
+    rows = main.load_analytics_index()
+    assert sorted(rows) == names
+    assert all("learning_sessions" not in row for row in rows.values())
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def _save_profile_repeatedly(data_dir, times):
+    main.DATA_DIR = Path(data_dir)
+    for _ in range(times):
+        main.StudentProfile.load("bob").record_session(1, "easy", "4", True, 1.0)
+
+
+def test_saves_from_several_processes_do_not_collide(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    main.StudentProfile(name="bob").save()
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=4, mp_context=context) as pool:
+        futures = [pool.submit(_save_profile_repeatedly, str(tmp_path), 50) for _ in range(4)]
+        for future in futures:
+            future.result()
+    assert json.loads((tmp_path / "student_bob.json").read_text())["name"] == "bob"
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_profile_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "PROFILE_CACHE_SIZE", 2)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+    for name in ("Ada", "Bo"):
+        main.StudentProfile(name=name).save()
+    ada = main.StudentProfile.load("Ada")
+    main.StudentProfile(name="Cy").save()
+    assert main.StudentProfile.load("Ada") is ada
+    assert str(tmp_path / "student_Bo.json") not in main._profile_cache
+
+
+def test_sessions_are_appended_to_a_separate_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+
+    profile = main.StudentProfile.load("Dee")
+    for qid in (1, 2, 3):
+        profile.record_session(qid, "easy", "a", qid != 2, 4.0)
+    header = json.loads(profile.path.read_text())
+    assert "learning_sessions" not in header
+    assert header["learning_session_count"] == 3
+    lines = profile.sessions_path.read_text().splitlines()
+    assert [json.loads(line)["question_id"] for line in lines] == [1, 2, 3]
+
+    main._profile_cache.clear()
+    loaded = main.StudentProfile.load("Dee")
+    assert [s["question_id"] for s in loaded.learning_sessions] == [1, 2, 3]
+    loaded.record_session(4, "easy", "a", True, 4.0)
+    assert len(profile.sessions_path.read_text().splitlines()) == 4
+
+
+def test_legacy_profile_with_inline_sessions_is_migrated(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+    sessions = [{"question_id": 7, "correct": True}]
+    (tmp_path / "student_Old.json").write_text(
+        json.dumps({"name": "Old", "quizzes": 1, "correct": 1, "learning_sessions": sessions})
+    )
+    profile = main.StudentProfile.load("Old")
+    assert profile.learning_sessions == sessions
+    profile.save()
+    assert "learning_sessions" not in json.loads(profile.path.read_text())
+    main._profile_cache.clear()
+    assert main.StudentProfile.load("Old").learning_sessions == sessions
+
+
+
+def test_load_fills_old_fields_and_ignores_unknown_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+    (tmp_path / "student_Kit.json").write_text(
+        json.dumps({"name": "Kit", "quizzes": 2, "correct": 1, "future_field": 3})
+    )
+    profile = main.StudentProfile.load("Kit")
+    assert profile.quiz_sessions == 1
+    assert profile.learning_sessions == []
+    assert profile.learning_style == "unknown"
+    assert profile.recent_correct_mask == 0
+
+def test_only_recent_sessions_are_kept_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+    monkeypatch.setattr(main, "SESSION_WINDOW", 4)
+
+    profile = main.StudentProfile.load("Eve")
+    for qid in range(1, 8):
+        profile.record_session(qid, "easy", "a", True, 1.0)
+    assert [s["question_id"] for s in profile.learning_sessions] == [4, 5, 6, 7]
+    assert len(profile.sessions_path.read_text().splitlines()) == 7
+
+    main._profile_cache.clear()
+    loaded = main.StudentProfile.load("Eve")
+    assert [s["question_id"] for s in loaded.learning_sessions] == [4, 5, 6, 7]
+    loaded.record_session(8, "easy", "a", True, 1.0)
+    lines = profile.sessions_path.read_text().splitlines()
+    assert [json.loads(line)["question_id"] for line in lines] == list(range(1, 9))
+    assert json.loads(profile.path.read_text())["learning_session_count"] == 8
+
+
+def test_derived_scores_refresh_after_each_answer(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    profile = main.StudentProfile(name="Gus")
+    for _ in range(3):
+        profile.record_session(1, "easy", "a", False, 100.0)
+    assert profile.recent_performance == 0.0
+    level = profile.engagement_level
+    assert profile.engagement_level == level
+    for _ in range(5):
+        profile.record_session(1, "easy", "a", True, 20.0)
+    assert profile.recent_performance == 5 / 8
+    assert profile.engagement_level != level
+
+
+def test_record_session_can_defer_the_save(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(main, "_profile_cache", main.OrderedDict())
+
+    profile = main.StudentProfile.load("Dee")
+    profile.record_session(1, "easy", "a", True, 1.0, save=False)
+    # The first answer still creates the file so later loads find the student
+    assert main.StudentProfile.load("Dee") is profile
+
+    profile.record_session(2, "easy", "a", True, 1.0, save=False)
+    assert main.StudentProfile.load("Dee") is profile
+    main._profile_cache.clear()
+    assert main.StudentProfile.load("Dee").quizzes == 1
+
+    profile.save()
+    reloaded = main.StudentProfile.load("Dee")
+    assert reloaded.quizzes == 2
+    assert [s["question_id"] for s in reloaded.learning_sessions] == [1, 2]